@@ -0,0 +1,83 @@
+import json
+import os
+from collections.abc import AsyncIterator
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import cache, crud
+from app.models import MenuTreeModel
+from app.services import (
+    BATCH_MEMBERSHIP,
+    MENUS_GENERATION,
+    MENUS_PAGES_GENERATION,
+    menu_generation,
+    write_generations,
+)
+
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", 10_000))
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+
+def tree_size(menu: MenuTreeModel) -> int:
+    return (
+        1 + len(menu.submenus) + sum(len(submenu.dishes) for submenu in menu.submenus)
+    )
+
+
+async def import_menu_trees(
+    db: AsyncSession, trees: AsyncIterator[dict]
+) -> dict[str, int]:
+    ids: dict[str, list[int]] = {name: [] for name in BATCH_MEMBERSHIP}
+    chunk: list[MenuTreeModel] = []
+    chunk_size = 0
+    async for tree in trees:
+        menu = MenuTreeModel.parse_obj(tree)
+        chunk.append(menu)
+        chunk_size += tree_size(menu)
+        # Chunks bound memory, they all still commit in the one transaction.
+        if chunk_size >= IMPORT_CHUNK_SIZE:
+            for name, item_ids in (await crud.copy_menu_trees(db, chunk)).items():
+                ids[name] += item_ids
+            chunk, chunk_size = [], 0
+    if chunk:
+        for name, item_ids in (await crud.copy_menu_trees(db, chunk)).items():
+            ids[name] += item_ids
+    await db.commit()
+    await cache_imported(ids)
+    return {name: len(item_ids) for name, item_ids in ids.items()}
+
+
+async def cache_imported(ids: dict[str, list[int]]) -> None:
+    if not ids["menu"]:
+        return
+    generations = {MENUS_GENERATION, MENUS_PAGES_GENERATION}
+    for menu_id in ids["menu"]:
+        generations.update([menu_generation(menu_id), *write_generations(menu_id)])
+    await cache.bump_generations(names=list(generations))
+    for name, item_ids in ids.items():
+        await cache.set_membership(BATCH_MEMBERSHIP[name], item_ids, True)
+
+
+async def import_ndjson(
+    db: AsyncSession, chunks: AsyncIterator[bytes]
+) -> dict[str, int]:
+    try:
+        return await import_menu_trees(db, iter_ndjson(chunks))
+    except ValueError as ex:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid menu tree: {ex}",
+        )
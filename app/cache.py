@@ -1,29 +1,465 @@
+import asyncio
 import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from json import dumps, loads
 
 import aioredis
 from fastapi.encoders import jsonable_encoder
 
+from app.cache_codecs import entry_codec, serialize
+from app.memory_cache import MemoryRedis
+
 REDIS_URL = os.environ.get("REDIS_URL")
-redis = aioredis.from_url(
-    url=REDIS_URL,
-    encoding="utf-8",
-    decode_responses=True,
+CACHE_BACKEND = os.environ.get(
+    "CACHE_BACKEND",
+    "memory" if (REDIS_URL or "").startswith("memory://") else "redis",
 )
+MEMORY_CACHE_SIZE = int(os.environ.get("MEMORY_CACHE_SIZE", 100_000))
+
+if CACHE_BACKEND == "memory":
+    redis = MemoryRedis(max_size=MEMORY_CACHE_SIZE)
+else:
+    redis = aioredis.from_url(
+        url=REDIS_URL,
+        encoding="utf-8",
+        decode_responses=False,
+    )
 
 REDIS_CACHE_TIME = 300
+REDIS_INVALIDATION_CHANNEL = "cache_invalidation"
+REDIS_LOCK_TIME = 5000
+REDIS_LOCK_WAIT_TIME = 1.0
+REDIS_LOCK_POLL_TIME = 0.05
+REDIS_WRITE_VERSION_TIME = 300
+
+MEMBERSHIP_FILTER_ENABLED = (
+    os.environ.get("MEMBERSHIP_FILTER_ENABLED", "false").lower() == "true"
+)
+
+LOCAL_CACHE_SIZE = int(os.environ.get("LOCAL_CACHE_SIZE", 1024))
+LOCAL_CACHE_TIME = float(os.environ.get("LOCAL_CACHE_TIME", 5))
+
+
+@dataclass(frozen=True)
+class CacheTTL:
+    fresh: int = REDIS_CACHE_TIME
+    grace: int = REDIS_CACHE_TIME
+    jitter: float = 0.1
+
+    def expiry(self) -> tuple[float, int]:
+        fresh = self.fresh * random.uniform(1 - self.jitter, 1 + self.jitter)
+        return time.time() + fresh, int(fresh + self.grace)
+
+
+DEFAULT_TTL = CacheTTL()
+NOT_FOUND_TTL = CacheTTL(fresh=30, grace=0, jitter=0.1)
+DELETE = object()
+
+
+class LocalCache:
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = False
+        self._items: OrderedDict = OrderedDict()
+
+    def get(self, name: str):
+        if not self.enabled:
+            return None
+        item = self._items.get(name)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._items[name]
+            return None
+        self._items.move_to_end(name)
+        return value
+
+    def set(self, name: str, value) -> None:
+        if not self.enabled:
+            return
+        self._items[name] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(name)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def delete(self, *names: str) -> None:
+        for name in names:
+            self._items.pop(name, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+local_cache = LocalCache(max_size=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TIME)
+_invalidation_listener: asyncio.Task | None = None
+_loading: dict[str, asyncio.Future] = {}
+
+
+async def get_entry(name: str) -> tuple[bytes | None, bool]:
+    entry = local_cache.get(name)
+    if entry is None:
+        entry = await redis.get(name=name)
+        if not entry:
+            return None, False
+        entry = entry_codec.decode_json(entry)
+        local_cache.set(name, entry)
+    value, fresh_until = entry
+    return value, fresh_until is not None and fresh_until < time.time()
+
+
+async def get_entries(names: list[str]) -> list[tuple[bytes | None, bool]]:
+    now = time.time()
+    return [
+        (entry[0], entry[1] is not None and entry[1] < now) if entry else (None, False)
+        for entry in await get_many(names)
+    ]
+
+
+def not_found_name(name: str) -> str:
+    return f"not_found_{name}"
+
+
+async def get_raw_cache(name: str) -> bytes | None:
+    value, _ = await get_entry(name)
+    return value
 
 
 async def get_cache(name):
-    value = await redis.get(name=name)
+    value = await get_raw_cache(name)
     return loads(value) if value else None
 
 
-async def set_cache(name, value):
-    return await redis.set(
-        name=name, value=dumps(jsonable_encoder(value)), ex=REDIS_CACHE_TIME
-    )
+def write_version_name(name: str) -> str:
+    return f"write_version_{name}"
+
+
+async def get_write_version(name: str) -> bytes | None:
+    return await redis.get(write_version_name(name))
+
+
+async def get_write_versions(names: list[str]) -> dict[str, bytes | None]:
+    versions = await redis.mget([write_version_name(name) for name in names])
+    return dict(zip(names, versions))
+
+
+def _encode_entry(value, ttl: CacheTTL) -> tuple[bytes | None, bytes, float, int]:
+    fresh_until, expire = ttl.expiry()
+    if isinstance(value, bytes):
+        # Already serialized JSON is stored without a decode and encode round trip.
+        return value, entry_codec.encode_json(value, fresh_until), fresh_until, expire
+    value = jsonable_encoder(value)
+    raw = serialize(value) if local_cache.enabled else None
+    return raw, entry_codec.encode(value, fresh_until), fresh_until, expire
+
+
+async def set_cache_unless_written(
+    name: str, value, ttl: CacheTTL, version: bytes | None
+) -> None:
+    raw, entry, fresh_until, expire = _encode_entry(value, ttl)
+    version_name = write_version_name(name)
+
+    async def store(pipe) -> None:
+        # A patch since the value was read means the value may predate that write.
+        if await pipe.get(version_name) != version:
+            return
+        pipe.multi()
+        pipe.set(name=name, value=entry, ex=expire)
+
+    if await redis.transaction(store, version_name) and raw is not None:
+        local_cache.set(name, (raw, fresh_until))
 
 
 async def delete_cache(names):
-    return await redis.delete(*names)
+    local_cache.delete(*names)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(*names)
+        pipe.publish(REDIS_INVALIDATION_CHANNEL, dumps(list(names)))
+        result = await pipe.execute()
+    return result[0]
+
+
+async def get_many(
+    names: list[str], decode: Callable = entry_codec.decode_json
+) -> list:
+    values = [local_cache.get(name) for name in names]
+    missing = [name for name, value in zip(names, values) if value is None]
+    if missing:
+        fetched = {}
+        for name, value in zip(missing, await redis.mget(missing)):
+            if value:
+                value = decode(value)
+                local_cache.set(name, value)
+            fetched[name] = value
+        values = [
+            fetched[name] if value is None else value
+            for name, value in zip(names, values)
+        ]
+    return values
+
+
+async def set_many(values: dict, ttl: dict[str, CacheTTL] | None = None) -> None:
+    ttl = ttl or {}
+    async with pipeline() as pipe:
+        for name, value in values.items():
+            value = jsonable_encoder(value)
+            fresh_until, expire = ttl.get(name, DEFAULT_TTL).expiry()
+            if local_cache.enabled:
+                local_cache.set(name, (serialize(value), fresh_until))
+            pipe.set(
+                name=name,
+                value=entry_codec.encode(value, fresh_until),
+                ex=expire,
+            )
+
+
+async def set_many_unless_written(
+    values: dict, versions: dict, ttl: dict[str, CacheTTL] | None = None
+) -> None:
+    if not values:
+        return
+    ttl = ttl or {}
+    entries = {
+        name: _encode_entry(value, ttl.get(name, DEFAULT_TTL))
+        for name, value in values.items()
+    }
+    version_names = [write_version_name(name) for name in entries]
+    stored = []
+
+    async def store(pipe) -> None:
+        stored.clear()
+        current = await pipe.mget(version_names)
+        pipe.multi()
+        for (name, (_, entry, _, expire)), version in zip(entries.items(), current):
+            # Entries patched since their version was read are left to the next load.
+            if version == versions.get(name):
+                stored.append(name)
+                pipe.set(name=name, value=entry, ex=expire)
+
+    if await redis.transaction(store, *version_names):
+        for name in stored:
+            raw, _, fresh_until, _ = entries[name]
+            if raw is not None:
+                local_cache.set(name, (raw, fresh_until))
+
+
+@asynccontextmanager
+async def pipeline(transaction: bool = False) -> AsyncIterator:
+    async with redis.pipeline(transaction=transaction) as pipe:
+        yield pipe
+        await pipe.execute()
+
+
+async def get_generations(names: list[str]) -> list[int]:
+    return [value or 0 for value in await get_many(names, int)]
+
+
+async def bump_generations(names: list[str]) -> None:
+    local_cache.delete(*names)
+    async with pipeline(transaction=True) as pipe:
+        for name in names:
+            pipe.incr(name)
+        pipe.publish(REDIS_INVALIDATION_CHANNEL, dumps(list(names)))
+
+
+async def patch_many(
+    names: list[str],
+    patcher: Callable[[dict], dict],
+    generations: list[str] | None = None,
+) -> None:
+    generations = generations or []
+
+    async def patch(pipe) -> None:
+        values = {}
+        fresh = {}
+        for name, entry in zip(names, await pipe.mget(names)):
+            values[name] = None
+            if entry:
+                raw, fresh[name] = entry_codec.decode_json(entry)
+                values[name] = loads(raw)
+        patched = patcher(values)
+        pipe.multi()
+        for name, value in patched.items():
+            if value is DELETE:
+                pipe.delete(name)
+            elif value is not None and values.get(name) is not None:
+                pipe.set(
+                    name=name,
+                    value=entry_codec.encode(jsonable_encoder(value), fresh[name]),
+                    keepttl=True,
+                )
+        # Loads that read the database before this write must not store their result.
+        for name in names:
+            pipe.incr(write_version_name(name))
+            pipe.expire(write_version_name(name), REDIS_WRITE_VERSION_TIME)
+        for name in generations:
+            pipe.incr(name)
+        pipe.publish(REDIS_INVALIDATION_CHANNEL, dumps([*names, *generations]))
+
+    local_cache.delete(*names, *generations)
+    await redis.transaction(patch, *names)
+
+
+async def is_member(name: str, item_id: int) -> bool:
+    if not MEMBERSHIP_FILTER_ENABLED:
+        return True
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.exists(name)
+        pipe.getbit(name, item_id)
+        exists, bit = await pipe.execute()
+    # Until the filter has been built every ID has to be checked in the database.
+    return not exists or bool(bit)
+
+
+async def set_membership(name: str, item_ids: list[int], is_member: bool) -> None:
+    if not MEMBERSHIP_FILTER_ENABLED or not item_ids:
+        return
+
+    async def update(pipe) -> None:
+        # SETBIT on a missing filter would create one that holds only these IDs
+        # and hides every other one, it stays off until the next rebuild instead.
+        if not await pipe.exists(name):
+            return
+        pipe.multi()
+        for item_id in item_ids:
+            pipe.setbit(name, item_id, int(is_member))
+
+    await redis.transaction(update, name)
+
+
+async def rebuild_membership(name: str, item_ids: list[int]) -> None:
+    rebuild_name = f"{name}_rebuild_{uuid.uuid4().hex}"
+    async with pipeline(transaction=True) as pipe:
+        pipe.setbit(rebuild_name, 0, 0)
+        for item_id in item_ids:
+            pipe.setbit(rebuild_name, item_id, 1)
+        # OR keeps bits set by writes that committed while the IDs were read.
+        pipe.bitop("OR", name, name, rebuild_name)
+        pipe.delete(rebuild_name)
+
+
+async def load_once(
+    name: str,
+    loader: Callable[[], Awaitable],
+    ttl: CacheTTL = DEFAULT_TTL,
+):
+    future = _loading.get(name)
+    if future is not None:
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+        return await load(name, loader, ttl)
+    future = asyncio.get_running_loop().create_future()
+    _loading[name] = future
+    try:
+        value = await _load_locked(name, loader, ttl, wait=True)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as ex:
+        future.set_exception(ex)
+        # Waiters re-raise it, the leader must not leave it unretrieved.
+        future.exception()
+        raise
+    else:
+        future.set_result(value)
+    finally:
+        _loading.pop(name, None)
+    return value
+
+
+async def refresh(
+    name: str, loader: Callable[[], Awaitable], ttl: CacheTTL = DEFAULT_TTL
+) -> None:
+    # Refreshes give up when another worker holds the lock, so they are not shared
+    # with requests, which would otherwise get that None as the loaded value.
+    if name not in _loading:
+        await _load_locked(name, loader, ttl, wait=False)
+
+
+async def _load_locked(
+    name: str, loader: Callable[[], Awaitable], ttl: CacheTTL, wait: bool
+):
+    lock_name = f"lock_{name}"
+    token = uuid.uuid4().hex
+    if not await redis.set(name=lock_name, value=token, nx=True, px=REDIS_LOCK_TIME):
+        if not wait:
+            return None
+        deadline = time.monotonic() + REDIS_LOCK_WAIT_TIME
+        while time.monotonic() < deadline:
+            await asyncio.sleep(REDIS_LOCK_POLL_TIME)
+            value = await get_cache(name)
+            if value is not None:
+                return value
+            if not await redis.exists(lock_name):
+                break
+        return await load(name, loader, ttl)
+    try:
+        return await load(name, loader, ttl)
+    finally:
+        await _release_lock(lock_name, token)
+
+
+async def load(name: str, loader: Callable[[], Awaitable], ttl: CacheTTL):
+    version = await get_write_version(name)
+    value = await loader()
+    if value is not None:
+        await set_cache_unless_written(name, value, ttl, version)
+    return value
+
+
+async def _release_lock(lock_name: str, token: str) -> None:
+    async def release(pipe) -> None:
+        if await pipe.get(lock_name) == token.encode():
+            pipe.multi()
+            pipe.delete(lock_name)
+
+    await redis.transaction(release, lock_name)
+
+
+async def listen_invalidations() -> None:
+    while True:
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(REDIS_INVALIDATION_CHANNEL)
+            # Entries are only trusted while invalidation messages are received.
+            local_cache.clear()
+            local_cache.enabled = True
+            async for message in pubsub.listen():
+                if message and message["type"] == "message":
+                    local_cache.delete(*loads(message["data"]))
+        except Exception as ex:
+            print(ex)
+        finally:
+            local_cache.enabled = False
+            local_cache.clear()
+            await pubsub.close()
+        await asyncio.sleep(1)
+
+
+async def start_invalidation_listener() -> None:
+    global _invalidation_listener
+    # The memory backend already lives in process, a local copy only adds staleness.
+    is_enabled = LOCAL_CACHE_SIZE > 0 and CACHE_BACKEND == "redis"
+    if _invalidation_listener is None and is_enabled:
+        _invalidation_listener = asyncio.create_task(listen_invalidations())
+
+
+async def stop_invalidation_listener() -> None:
+    global _invalidation_listener
+    if _invalidation_listener is not None:
+        _invalidation_listener.cancel()
+        try:
+            await _invalidation_listener
+        except asyncio.CancelledError:
+            pass
+        _invalidation_listener = None
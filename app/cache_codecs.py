@@ -0,0 +1,123 @@
+import os
+import struct
+import zlib
+from json import dumps, loads
+
+import msgpack
+
+CACHE_CODEC = os.environ.get("CACHE_CODEC", "json")
+CACHE_COMPRESS_THRESHOLD = int(os.environ.get("CACHE_COMPRESS_THRESHOLD", 1024))
+CACHE_COMPRESS_LEVEL = int(os.environ.get("CACHE_COMPRESS_LEVEL", 1))
+
+COMPRESSED_FLAG = 0x80
+STAMPED_FLAG = 0x40
+STAMP = struct.Struct(">I")
+STAMP_SIZE = STAMP.size
+
+
+def serialize(value) -> bytes:
+    return dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class JsonCodec:
+    header = 0x01
+
+    @staticmethod
+    def encode(value) -> bytes:
+        return serialize(value)
+
+    @staticmethod
+    def decode(payload: bytes):
+        return loads(payload)
+
+    @staticmethod
+    def to_json(payload: bytes) -> bytes:
+        return payload
+
+    @staticmethod
+    def from_json(raw: bytes) -> bytes:
+        return raw
+
+
+class MsgpackCodec:
+    header = 0x02
+
+    @staticmethod
+    def encode(value) -> bytes:
+        return msgpack.packb(value)
+
+    @staticmethod
+    def decode(payload: bytes):
+        return msgpack.unpackb(payload)
+
+    @classmethod
+    def to_json(cls, payload: bytes) -> bytes:
+        return serialize(cls.decode(payload))
+
+    @staticmethod
+    def from_json(raw: bytes) -> bytes:
+        return msgpack.packb(loads(raw))
+
+
+CODECS = {
+    "json": JsonCodec,
+    "msgpack": MsgpackCodec,
+}
+CODECS_BY_HEADER = {codec.header: codec for codec in CODECS.values()}
+
+
+class EntryCodec:
+    def __init__(
+        self, codec: str, compress_threshold: int, compress_level: int
+    ) -> None:
+        self.codec = CODECS[codec]
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def _pack(self, payload: bytes, fresh_until: float | None) -> bytes:
+        header = self.codec.header
+        if 0 <= self.compress_threshold <= len(payload):
+            payload = zlib.compress(payload, self.compress_level)
+            header |= COMPRESSED_FLAG
+        stamp = b""
+        if fresh_until is not None:
+            header |= STAMPED_FLAG
+            stamp = STAMP.pack(int(fresh_until))
+        return bytes((header,)) + stamp + payload
+
+    @staticmethod
+    def _unpack(entry: bytes):
+        header = entry[0]
+        codec = CODECS_BY_HEADER.get(header & ~(COMPRESSED_FLAG | STAMPED_FLAG))
+        if codec is None:
+            # Entries written before codecs were introduced are plain JSON.
+            return JsonCodec, entry, None
+        payload = entry[1:]
+        fresh_until = None
+        if header & STAMPED_FLAG:
+            (fresh_until,) = STAMP.unpack_from(payload)
+            payload = payload[STAMP_SIZE:]
+        if header & COMPRESSED_FLAG:
+            payload = zlib.decompress(payload)
+        return codec, payload, fresh_until
+
+    def encode(self, value, fresh_until: float | None = None) -> bytes:
+        return self._pack(self.codec.encode(value), fresh_until)
+
+    def encode_json(self, raw: bytes, fresh_until: float | None = None) -> bytes:
+        return self._pack(self.codec.from_json(raw), fresh_until)
+
+    def decode(self, entry: bytes):
+        codec, payload, _ = self._unpack(entry)
+        return codec.decode(payload)
+
+    def decode_json(self, entry: bytes) -> tuple[bytes, float | None]:
+        codec, payload, fresh_until = self._unpack(entry)
+        return codec.to_json(payload), fresh_until
+
+
+entry_codec = EntryCodec(
+    codec=CACHE_CODEC,
+    compress_threshold=CACHE_COMPRESS_THRESHOLD,
+    compress_level=CACHE_COMPRESS_LEVEL,
+)
@@ -1,12 +1,40 @@
-from sqlalchemy import distinct, func, select
+from collections import Counter
+from collections.abc import Iterable
+from decimal import Decimal
+
+from sqlalchemy import (
+    Integer,
+    String,
+    Text,
+    any_,
+    bindparam,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    null,
+    select,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import Dish, Menu, Submenu
+from app.database import SEARCH_CONFIG, Dish, Menu, Submenu, search_vector
 from app.models import (
+    BatchOperationModel,
     DishModel,
     MenuModel,
+    MenuTreeModel,
+    ParentCountsModel,
     ResponseDishModel,
+    ResponseDishQueryResultModel,
     ResponseMenuModel,
+    ResponseSearchResultModel,
     ResponseSubmenuModel,
     SubmenuModel,
     UpdateDishModel,
@@ -16,160 +44,318 @@ from app.models import (
 
 
 async def create_menu(db: AsyncSession, menu: MenuModel) -> ResponseMenuModel:
-    menu = Menu(**menu.dict())
-    db.add(menu)
+    result = await db.execute(
+        insert(Menu)
+        .values(**menu.dict())
+        .returning(Menu.id, Menu.title, Menu.description)
+    )
+    menu = result.first()
     await db.commit()
-    await db.refresh(menu)
     return ResponseMenuModel.from_orm(menu)
 
 
+def menu_counts(menu) -> list:
+    # Writes return the parent counters they left behind, the cache is set from them.
+    return [
+        select(menu.c.submenus_counter).scalar_subquery().label("submenus_count"),
+        select(menu.c.dishes_counter).scalar_subquery().label("dishes_count"),
+    ]
+
+
 async def create_submenu(
     db: AsyncSession, submenu: SubmenuModel, menu_id: int
-) -> ResponseSubmenuModel | None:
-    menu = await get_menu(db, menu_id)
-    if menu:
-        submenu = Submenu(**submenu.dict(), menu_id=menu_id)
-        db.add(submenu)
-        await db.commit()
-        await db.refresh(submenu)
-        return ResponseSubmenuModel.from_orm(submenu)
-    return None
+) -> tuple[ResponseSubmenuModel, ParentCountsModel] | None:
+    # The parent counter update yields the menu id only if the menu exists.
+    menu = (
+        update(Menu)
+        .where(Menu.id == menu_id)
+        .values(submenus_counter=Menu.submenus_counter + 1)
+        .returning(Menu.id, Menu.submenus_counter, Menu.dishes_counter)
+        .cte("menu")
+    )
+    result = await db.execute(
+        insert(Submenu)
+        .from_select(
+            ["title", "description", "menu_id"],
+            select(literal(submenu.title), literal(submenu.description), menu.c.id),
+        )
+        .returning(Submenu.id, Submenu.title, Submenu.description, *menu_counts(menu))
+        .add_cte(menu)
+    )
+    submenu = result.first()
+    await db.commit()
+    if not submenu:
+        return None
+    return ResponseSubmenuModel.from_orm(submenu), ParentCountsModel.from_orm(submenu)
 
 
 async def create_dish(
     db: AsyncSession, dish: DishModel, menu_id: int, submenu_id: int
-) -> ResponseDishModel | None:
-    submenu = await get_submenu(db, menu_id, submenu_id)
-    if submenu:
-        dish = Dish(**dish.dict(), submenu_id=submenu_id)
-        db.add(dish)
-        await db.commit()
-        await db.refresh(dish)
-        return ResponseDishModel.from_orm(dish)
-    return None
-
-
-async def get_menus_list(db: AsyncSession) -> list[ResponseMenuModel]:
+) -> tuple[ResponseDishModel, ParentCountsModel] | None:
+    submenu = (
+        update(Submenu)
+        .where(Submenu.id == submenu_id, Submenu.menu_id == menu_id)
+        .values(dishes_counter=Submenu.dishes_counter + 1)
+        .returning(Submenu.id, Submenu.menu_id, Submenu.dishes_counter)
+        .cte("submenu")
+    )
+    menu = (
+        update(Menu)
+        .where(Menu.id == submenu.c.menu_id)
+        .values(dishes_counter=Menu.dishes_counter + 1)
+        .returning(Menu.submenus_counter, Menu.dishes_counter)
+        .cte("menu")
+    )
     result = await db.execute(
-        select(
-            Menu,
-            func.count(distinct(Submenu.id)),
-            func.count(Dish.id),
+        insert(Dish)
+        .from_select(
+            ["title", "description", "price", "submenu_id"],
+            select(
+                literal(dish.title),
+                literal(dish.description),
+                literal(dish.price, Dish.price.type),
+                submenu.c.id,
+            ),
         )
-        .join(
-            Submenu,
-            Menu.id == Submenu.menu_id,
-            isouter=True,
-        )
-        .join(
-            Dish,
-            Submenu.id == Dish.submenu_id,
-            isouter=True,
+        .returning(
+            Dish.id,
+            Dish.title,
+            Dish.description,
+            Dish.price,
+            *menu_counts(menu),
+            select(submenu.c.dishes_counter)
+            .scalar_subquery()
+            .label("submenu_dishes_count"),
         )
-        .group_by(Menu.id),
+        .add_cte(submenu)
+        .add_cte(menu)
     )
-    menus = []
-    for row in result.all():
-        menu = ResponseMenuModel.from_orm(row[0])
-        menu.submenus_count = row[1]
-        menu.dishes_count = row[2]
-        menus.append(menu)
-    return menus
+    dish = result.first()
+    await db.commit()
+    if not dish:
+        return None
+    return ResponseDishModel.from_orm(dish), ParentCountsModel.from_orm(dish)
 
 
-async def get_menu(db: AsyncSession, menu_id: int) -> ResponseMenuModel | None:
-    result = await db.execute(
-        select(
-            Menu,
-            func.count(distinct(Submenu.id)),
-            func.count(Dish.id),
-        )
-        .join(
-            Submenu,
-            Menu.id == Submenu.menu_id,
-            isouter=True,
-        )
-        .join(
-            Dish,
-            Submenu.id == Dish.submenu_id,
-            isouter=True,
-        )
-        .filter(Menu.id == menu_id)
-        .group_by(Menu.id)
-        .limit(1),
+def menu_response(menu: Menu) -> ResponseMenuModel:
+    response = ResponseMenuModel.from_orm(menu)
+    response.submenus_count = menu.submenus_counter
+    response.dishes_count = menu.dishes_counter
+    return response
+
+
+def submenu_response(submenu: Submenu) -> ResponseSubmenuModel:
+    response = ResponseSubmenuModel.from_orm(submenu)
+    response.dishes_count = submenu.dishes_counter
+    return response
+
+
+def keyset(query, column):
+    # Ids start at 1 and LIMIT NULL means no limit, so one statement serves every page.
+    return (
+        query.filter(column > bindparam("after_id", type_=Integer))
+        .order_by(column)
+        .limit(bindparam("limit", type_=Integer))
     )
-    result = result.first()
-    menu = None
-    if result:
-        menu = ResponseMenuModel.from_orm(result[0])
-        menu.submenus_count = result[1]
-        menu.dishes_count = result[2]
-    return menu
+
+
+def page_params(after_id: int | None, limit: int | None) -> dict:
+    return {"after_id": after_id or 0, "limit": limit}
+
+
+# Hot reads are built once, calls only bind parameters, which keeps their
+# compiled form and the asyncpg prepared statement cached.
+MENUS_PAGE = keyset(select(Menu), Menu.id)
+MENU = select(Menu).filter(Menu.id == bindparam("menu_id")).limit(1)
+SUBMENUS_PAGE = keyset(
+    select(Submenu).filter(Submenu.menu_id == bindparam("menu_id")), Submenu.id
+)
+SUBMENU = (
+    select(Submenu)
+    .filter(
+        Submenu.menu_id == bindparam("menu_id"), Submenu.id == bindparam("submenu_id")
+    )
+    .limit(1)
+)
+DISHES_PAGE = keyset(
+    select(Dish)
+    .join(Submenu)
+    .filter(
+        Submenu.id == bindparam("submenu_id"), Submenu.menu_id == bindparam("menu_id")
+    ),
+    Dish.id,
+)
+DISH = (
+    select(Dish)
+    .join(Submenu)
+    .filter(
+        Submenu.id == bindparam("submenu_id"),
+        Submenu.menu_id == bindparam("menu_id"),
+        Dish.id == bindparam("dish_id"),
+    )
+    .limit(1)
+)
+
+
+async def get_menus_list(
+    db: AsyncSession, after_id: int | None = None, limit: int | None = None
+) -> list[ResponseMenuModel]:
+    result = await db.execute(MENUS_PAGE, page_params(after_id, limit))
+    return [menu_response(menu) for menu in result.scalars().all()]
+
+
+async def get_menu(db: AsyncSession, menu_id: int) -> ResponseMenuModel | None:
+    result = await db.execute(MENU, {"menu_id": menu_id})
+    result = result.scalar()
+    return menu_response(result) if result else None
 
 
 async def get_submenus_list(
-    db: AsyncSession, menu_id: int
+    db: AsyncSession,
+    menu_id: int,
+    after_id: int | None = None,
+    limit: int | None = None,
 ) -> list[ResponseSubmenuModel]:
     result = await db.execute(
-        select(
-            Submenu,
-            func.count(Dish.id),
-        )
-        .join(
-            Dish,
-            Submenu.id == Dish.submenu_id,
-            isouter=True,
-        )
-        .filter(Submenu.menu_id == menu_id)
-        .group_by(Submenu.id),
-    )
-    submenus = []
-    for row in result.all():
-        submenu = ResponseSubmenuModel.from_orm(row[0])
-        submenu.dishes_count = row[1]
-        submenus.append(submenu)
+        SUBMENUS_PAGE, {"menu_id": menu_id, **page_params(after_id, limit)}
+    )
+    return [submenu_response(submenu) for submenu in result.scalars().all()]
+
+
+async def get_submenus_by_menu(
+    db: AsyncSession,
+) -> dict[int, list[ResponseSubmenuModel]]:
+    result = await db.execute(select(Submenu).order_by(Submenu.id))
+    submenus: dict[int, list[ResponseSubmenuModel]] = {}
+    for submenu in result.scalars().all():
+        submenus.setdefault(submenu.menu_id, []).append(submenu_response(submenu))
     return submenus
 
 
+async def get_submenu_sizes(db: AsyncSession) -> list[tuple[int, int, int]]:
+    result = await db.execute(
+        select(Submenu.dishes_counter, Submenu.menu_id, Submenu.id)
+    )
+    return [tuple(row) for row in result.all()]
+
+
 async def get_submenu(
     db: AsyncSession, menu_id: int, submenu_id: int
 ) -> ResponseSubmenuModel | None:
+    result = await db.execute(SUBMENU, {"menu_id": menu_id, "submenu_id": submenu_id})
+    result = result.scalar()
+    return submenu_response(result) if result else None
+
+
+async def get_dishes_list(
+    db: AsyncSession,
+    menu_id: int,
+    submenu_id: int,
+    after_id: int | None = None,
+    limit: int | None = None,
+) -> list[ResponseDishModel]:
     result = await db.execute(
-        select(
-            Submenu,
-            func.count(Dish.id),
+        DISHES_PAGE,
+        {"menu_id": menu_id, "submenu_id": submenu_id, **page_params(after_id, limit)},
+    )
+    result = result.scalars().all()
+    dishes = [ResponseDishModel.from_orm(row) for row in result]
+    return dishes
+
+
+DISH_SORTS = {
+    "id": [Dish.id],
+    "price": [Dish.price, Dish.id],
+    "title": [Dish.title, Dish.id],
+}
+
+
+def filter_dishes(
+    query,
+    sort: str,
+    min_price: Decimal | None,
+    max_price: Decimal | None,
+    after: tuple | None,
+    limit: int | None,
+):
+    if min_price is not None:
+        query = query.filter(Dish.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Dish.price <= max_price)
+    columns = DISH_SORTS[sort]
+    if after is not None:
+        query = query.filter(tuple_(*columns) > tuple_(*after))
+    return query.order_by(*columns).limit(limit)
+
+
+async def get_filtered_dishes_list(
+    db: AsyncSession,
+    menu_id: int,
+    submenu_id: int,
+    sort: str = "id",
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None,
+    after: tuple | None = None,
+    limit: int | None = None,
+) -> list[ResponseDishModel]:
+    result = await db.execute(
+        filter_dishes(
+            select(Dish)
+            .join(Submenu)
+            .filter(Submenu.id == submenu_id, Submenu.menu_id == menu_id),
+            sort,
+            min_price,
+            max_price,
+            after,
+            limit,
         )
-        .join(
-            Dish,
-            Submenu.id == Dish.submenu_id,
-            isouter=True,
+    )
+    return [ResponseDishModel.from_orm(row) for row in result.scalars().all()]
+
+
+async def query_dishes(
+    db: AsyncSession,
+    sort: str = "id",
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None,
+    after: tuple | None = None,
+    limit: int | None = None,
+) -> list[ResponseDishQueryResultModel]:
+    result = await db.execute(
+        filter_dishes(
+            select(
+                Dish.id,
+                Dish.title,
+                Dish.description,
+                Dish.price,
+                Submenu.menu_id,
+                Dish.submenu_id,
+            ).join(Submenu),
+            sort,
+            min_price,
+            max_price,
+            after,
+            limit,
         )
-        .filter(Submenu.menu_id == menu_id, Submenu.id == submenu_id)
-        .group_by(Submenu.id)
-        .limit(1),
     )
-    result = result.first()
-    submenu = None
-    if result:
-        submenu = ResponseSubmenuModel.from_orm(result[0])
-        submenu.dishes_count = result[1]
-    return submenu
+    return [ResponseDishQueryResultModel.from_orm(row) for row in result.all()]
 
 
-async def get_dishes_list(
-    db: AsyncSession, menu_id: int, submenu_id: int
-) -> list[ResponseDishModel]:
+async def get_dishes_by_submenu(
+    db: AsyncSession, submenu_ids: list[int]
+) -> dict[int, list[ResponseDishModel]]:
     result = await db.execute(
         select(
             Dish,
         )
-        .join(
-            Submenu,
-        )
-        .filter(Submenu.id == submenu_id, Submenu.menu_id == menu_id),
+        .filter(Dish.submenu_id.in_(submenu_ids))
+        .order_by(Dish.id),
     )
-    result = result.scalars().all()
-    dishes = [ResponseDishModel.from_orm(row) for row in result]
+    dishes: dict[int, list[ResponseDishModel]] = {
+        submenu_id: [] for submenu_id in submenu_ids
+    }
+    for row in result.scalars().all():
+        dishes[row.submenu_id].append(ResponseDishModel.from_orm(row))
     return dishes
 
 
@@ -177,18 +363,7 @@ async def get_dish(
     db: AsyncSession, menu_id: int, submenu_id: int, dish_id: int
 ) -> ResponseDishModel | None:
     result = await db.execute(
-        select(
-            Dish,
-        )
-        .join(
-            Submenu,
-        )
-        .filter(
-            Submenu.id == submenu_id,
-            Submenu.menu_id == menu_id,
-            Dish.id == dish_id,
-        )
-        .limit(1),
+        DISH, {"menu_id": menu_id, "submenu_id": submenu_id, "dish_id": dish_id}
     )
     result = result.scalar()
     dish = None
@@ -197,23 +372,144 @@ async def get_dish(
     return dish
 
 
+def json_object(**fields):
+    return func.json_build_object(
+        *(
+            arg
+            for name, value in fields.items()
+            for arg in (literal_column(f"'{name}'"), value)
+        )
+    )
+
+
+def json_list(item, order_by):
+    return func.coalesce(
+        func.json_agg(aggregate_order_by(item, order_by)), literal_column("'[]'")
+    )
+
+
+DISHES_TREE = (
+    select(
+        json_list(
+            json_object(
+                id=cast(Dish.id, String),
+                title=Dish.title,
+                description=Dish.description,
+                price=cast(Dish.price, String),
+            ),
+            Dish.id,
+        )
+    )
+    .where(Dish.submenu_id == Submenu.id)
+    .scalar_subquery()
+)
+SUBMENUS_TREE = (
+    select(
+        json_list(
+            json_object(
+                id=cast(Submenu.id, String),
+                title=Submenu.title,
+                description=Submenu.description,
+                dishes_count=Submenu.dishes_counter,
+                dishes=DISHES_TREE,
+            ),
+            Submenu.id,
+        )
+    )
+    .where(Submenu.menu_id == Menu.id)
+    .scalar_subquery()
+)
+MENU_TREE_OBJECT = json_object(
+    id=cast(Menu.id, String),
+    title=Menu.title,
+    description=Menu.description,
+    submenus_count=Menu.submenus_counter,
+    dishes_count=Menu.dishes_counter,
+    submenus=SUBMENUS_TREE,
+)
+# Postgres serializes the whole document, it is returned as text to skip decoding.
+MENUS_TREE = select(cast(json_list(MENU_TREE_OBJECT, Menu.id), Text))
+MENU_TREE = select(cast(MENU_TREE_OBJECT, Text)).where(Menu.id == bindparam("menu_id"))
+
+
+async def get_menus_tree(db: AsyncSession) -> bytes:
+    result = await db.execute(MENUS_TREE)
+    return result.scalar().encode()
+
+
+async def get_menu_tree(db: AsyncSession, menu_id: int) -> bytes | None:
+    result = await db.execute(MENU_TREE, {"menu_id": menu_id})
+    tree = result.scalar()
+    return tree.encode() if tree else None
+
+
+SEARCH_QUERY = func.to_tsquery(
+    literal_column(f"'{SEARCH_CONFIG}'"), bindparam("query", type_=String)
+)
+DISH_SEARCH_VECTOR = search_vector(Dish.title, Dish.description)
+SUBMENU_SEARCH_VECTOR = search_vector(Submenu.title, Submenu.description)
+SEARCH_MATCHES = union_all(
+    select(
+        literal_column("'dish'").label("type"),
+        Dish.id,
+        Dish.title,
+        Dish.description,
+        Dish.price,
+        Submenu.menu_id,
+        Dish.submenu_id,
+        func.ts_rank(DISH_SEARCH_VECTOR, SEARCH_QUERY).label("rank"),
+    )
+    .join(Submenu)
+    .where(DISH_SEARCH_VECTOR.op("@@")(SEARCH_QUERY)),
+    select(
+        literal_column("'submenu'"),
+        Submenu.id,
+        Submenu.title,
+        Submenu.description,
+        cast(null(), Dish.price.type),
+        Submenu.menu_id,
+        cast(null(), Integer),
+        func.ts_rank(SUBMENU_SEARCH_VECTOR, SEARCH_QUERY),
+    ).where(SUBMENU_SEARCH_VECTOR.op("@@")(SEARCH_QUERY)),
+).subquery("matches")
+SEARCH = (
+    select(SEARCH_MATCHES)
+    .order_by(SEARCH_MATCHES.c.rank.desc(), SEARCH_MATCHES.c.type, SEARCH_MATCHES.c.id)
+    .offset(bindparam("offset", type_=Integer))
+    .limit(bindparam("limit", type_=Integer))
+)
+
+
+async def search(
+    db: AsyncSession, query: str, offset: int | None = None, limit: int | None = None
+) -> list[ResponseSearchResultModel]:
+    result = await db.execute(
+        SEARCH, {"query": query, "offset": offset or 0, "limit": limit}
+    )
+    return [ResponseSearchResultModel.from_orm(row) for row in result.all()]
+
+
+def updated_values(update_model, unchanged) -> dict:
+    values = {name: value for name, value in update_model.dict().items() if value}
+    # An UPDATE needs at least one assignment to still return the row.
+    return values or {"title": unchanged}
+
+
 async def update_menu(
     db: AsyncSession,
     menu_update: UpdateMenuModel,
     menu_id: int,
 ) -> ResponseMenuModel | None:
-    menu = await db.execute(select(Menu).filter(Menu.id == menu_id).limit(1))
-    menu = menu.scalar()
-    if menu:
-        menu.title = menu_update.title if menu_update.title else menu.title
-        menu.description = (
-            menu_update.description if menu_update.description else menu.description
-        )
-        db.add(menu)
-        await db.commit()
-        await db.refresh(menu)
-        return ResponseMenuModel.from_orm(menu)
-    return None
+    result = await db.execute(
+        update(Menu)
+        .where(Menu.id == menu_id)
+        .values(updated_values(menu_update, Menu.title))
+        .returning(Menu.id, Menu.title, Menu.description)
+        .execution_options(synchronize_session=False)
+    )
+    menu = result.first()
+    await db.commit()
+    return ResponseMenuModel.from_orm(menu) if menu else None
 
 
 async def update_submenu(
@@ -222,24 +518,16 @@ async def update_submenu(
     menu_id: int,
     submenu_id: int,
 ) -> ResponseSubmenuModel | None:
-    submenu = await db.execute(
-        select(Submenu)
-        .filter(Submenu.id == submenu_id, Submenu.menu_id == menu_id)
-        .limit(1)
-    )
-    submenu = submenu.scalar()
-    if submenu:
-        submenu.title = submenu_update.title if submenu_update.title else submenu.title
-        submenu.description = (
-            submenu_update.description
-            if submenu_update.description
-            else submenu.description
-        )
-        db.add(submenu)
-        await db.commit()
-        await db.refresh(submenu)
-        return ResponseSubmenuModel.from_orm(submenu)
-    return None
+    result = await db.execute(
+        update(Submenu)
+        .where(Submenu.id == submenu_id, Submenu.menu_id == menu_id)
+        .values(updated_values(submenu_update, Submenu.title))
+        .returning(Submenu.id, Submenu.title, Submenu.description)
+        .execution_options(synchronize_session=False)
+    )
+    submenu = result.first()
+    await db.commit()
+    return ResponseSubmenuModel.from_orm(submenu) if submenu else None
 
 
 async def update_dish(
@@ -249,83 +537,544 @@ async def update_dish(
     submenu_id: int,
     dish_id: int,
 ) -> ResponseDishModel | None:
-    dish = await db.execute(
-        select(
-            Dish,
-        )
-        .join(
-            Submenu,
-        )
-        .filter(
+    result = await db.execute(
+        update(Dish)
+        .where(
+            Dish.id == dish_id,
+            Dish.submenu_id == Submenu.id,
             Submenu.id == submenu_id,
             Submenu.menu_id == menu_id,
-            Dish.id == dish_id,
         )
-        .limit(1),
+        .values(updated_values(dish_update, Dish.title))
+        .returning(Dish.id, Dish.title, Dish.description, Dish.price)
+        .execution_options(synchronize_session=False)
     )
-    dish = dish.scalar()
-    if dish:
-        dish.title = dish_update.title if dish_update.title else dish.title
-        dish.description = (
-            dish_update.description if dish_update.description else dish.description
-        )
-        dish.price = dish_update.price if dish_update.price else dish.price
-        db.add(dish)
-        await db.commit()
-        await db.refresh(dish)
-        return ResponseDishModel.from_orm(dish)
-    return None
+    dish = result.first()
+    await db.commit()
+    return ResponseDishModel.from_orm(dish) if dish else None
 
 
 async def delete_menu(db: AsyncSession, menu_id: int) -> ResponseMenuModel | None:
-    menu = await db.execute(select(Menu).filter(Menu.id == menu_id).limit(1))
-    menu = menu.scalar()
-    if menu:
-        await db.delete(menu)
-        await db.commit()
-        return ResponseMenuModel.from_orm(menu)
-    return None
+    result = await db.execute(
+        delete(Menu)
+        .where(Menu.id == menu_id)
+        .returning(Menu.id, Menu.title, Menu.description)
+        .execution_options(synchronize_session=False)
+    )
+    menu = result.first()
+    await db.commit()
+    return ResponseMenuModel.from_orm(menu) if menu else None
 
 
 async def delete_submenu(
     db: AsyncSession, menu_id: int, submenu_id: int
-) -> ResponseSubmenuModel | None:
-    submenu = await db.execute(
-        select(Submenu)
-        .filter(Submenu.id == submenu_id, Submenu.menu_id == menu_id)
-        .limit(1)
+) -> tuple[ResponseSubmenuModel, ParentCountsModel] | None:
+    deleted_submenu = (
+        delete(Submenu)
+        .where(Submenu.id == submenu_id, Submenu.menu_id == menu_id)
+        .returning(
+            Submenu.id,
+            Submenu.title,
+            Submenu.description,
+            Submenu.dishes_counter,
+            Submenu.menu_id,
+        )
+        .cte("deleted_submenu")
+    )
+    # Updating the parent FROM the deleted row makes it a no-op when nothing matched.
+    result = await db.execute(
+        update(Menu)
+        .where(Menu.id == deleted_submenu.c.menu_id)
+        .values(
+            submenus_counter=Menu.submenus_counter - 1,
+            dishes_counter=Menu.dishes_counter - deleted_submenu.c.dishes_counter,
+        )
+        .returning(
+            deleted_submenu.c.id,
+            deleted_submenu.c.title,
+            deleted_submenu.c.description,
+            Menu.submenus_counter.label("submenus_count"),
+            Menu.dishes_counter.label("dishes_count"),
+        )
+        .execution_options(synchronize_session=False)
     )
-    submenu = submenu.scalar()
-    if submenu:
-        await db.delete(submenu)
-        await db.commit()
-        return ResponseSubmenuModel.from_orm(submenu)
-    return None
+    submenu = result.first()
+    await db.commit()
+    if not submenu:
+        return None
+    return ResponseSubmenuModel.from_orm(submenu), ParentCountsModel.from_orm(submenu)
 
 
 async def delete_dish(
     db: AsyncSession, menu_id: int, submenu_id: int, dish_id: int
-) -> ResponseDishModel | None:
-    dish = await db.execute(
+) -> tuple[ResponseDishModel, ParentCountsModel] | None:
+    deleted_dish = (
+        delete(Dish)
+        .where(
+            Dish.id == dish_id,
+            Dish.submenu_id == Submenu.id,
+            Submenu.id == submenu_id,
+            Submenu.menu_id == menu_id,
+        )
+        .returning(Dish.id, Dish.title, Dish.description, Dish.price, Submenu.menu_id)
+        .cte("deleted_dish")
+    )
+    submenu = (
+        update(Submenu)
+        .where(Submenu.id == submenu_id, select(deleted_dish.c.id).exists())
+        .values(dishes_counter=Submenu.dishes_counter - 1)
+        .returning(Submenu.dishes_counter)
+        .cte("submenu")
+    )
+    result = await db.execute(
+        update(Menu)
+        .where(Menu.id == deleted_dish.c.menu_id)
+        .values(dishes_counter=Menu.dishes_counter - 1)
+        .returning(
+            deleted_dish.c.id,
+            deleted_dish.c.title,
+            deleted_dish.c.description,
+            deleted_dish.c.price,
+            Menu.submenus_counter.label("submenus_count"),
+            Menu.dishes_counter.label("dishes_count"),
+            select(submenu.c.dishes_counter)
+            .scalar_subquery()
+            .label("submenu_dishes_count"),
+        )
+        .add_cte(submenu)
+        .execution_options(synchronize_session=False)
+    )
+    dish = result.first()
+    await db.commit()
+    if not dish:
+        return None
+    return ResponseDishModel.from_orm(dish), ParentCountsModel.from_orm(dish)
+
+
+async def recount_counters(
+    db: AsyncSession,
+    menu_ids: list[int] | None = None,
+    submenu_ids: list[int] | None = None,
+) -> None:
+    submenus = update(Submenu).values(
+        dishes_counter=select(func.count(Dish.id))
+        .where(Dish.submenu_id == Submenu.id)
+        .scalar_subquery()
+    )
+    if submenu_ids is not None:
+        submenus = submenus.where(Submenu.id.in_(submenu_ids))
+    menus = update(Menu).values(
+        submenus_counter=select(func.count(Submenu.id))
+        .where(Submenu.menu_id == Menu.id)
+        .scalar_subquery(),
+        dishes_counter=select(func.coalesce(func.sum(Submenu.dishes_counter), 0))
+        .where(Submenu.menu_id == Menu.id)
+        .scalar_subquery(),
+    )
+    if menu_ids is not None:
+        menus = menus.where(Menu.id.in_(menu_ids))
+    await db.execute(submenus.execution_options(synchronize_session=False))
+    await db.execute(menus.execution_options(synchronize_session=False))
+
+
+def unnest(**columns: tuple[list, object]):
+    # One typed array per column keeps the statement size independent of the rows.
+    return (
+        func.unnest(*(cast(values, ARRAY(type_)) for values, type_ in columns.values()))
+        .table_valued(*(column(name, type_) for name, (_, type_) in columns.items()))
+        .render_derived(name="rows")
+    )
+
+
+def data_values(operations: list[BatchOperationModel], name: str) -> list:
+    return [operation.data[name] for operation in operations]
+
+
+def changed_values(operations: list[BatchOperationModel], name: str) -> list:
+    # Empty fields keep the stored value, like in single updates.
+    return [operation.data[name] or None for operation in operations]
+
+
+def count_changes(changes: Iterable[tuple[int, int]]) -> Counter:
+    counts: Counter = Counter()
+    for item_id, change in changes:
+        counts[item_id] += change
+    return counts
+
+
+async def add_to_counters(db: AsyncSession, model, **deltas: Counter) -> None:
+    # Adding the batch's own changes keeps concurrent single writes, unlike a recount.
+    ids = sorted({item_id for delta in deltas.values() for item_id in delta})
+    if not ids:
+        return
+    rows = unnest(
+        id=(ids, Integer),
+        **{
+            key: ([delta[item_id] for item_id in ids], Integer)
+            for key, delta in deltas.items()
+        },
+    )
+    await db.execute(
+        update(model)
+        .where(model.id == rows.c.id)
+        .values(**{key: getattr(model, key) + rows.c[key] for key in deltas})
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def allocate_ids(db: AsyncSession, model, count: int) -> list[int]:
+    result = await db.execute(
         select(
-            Dish,
+            func.nextval(func.pg_get_serial_sequence(model.__tablename__, "id"))
+        ).select_from(func.generate_series(1, count))
+    )
+    return list(result.scalars().all())
+
+
+async def batch_create_menus(
+    db: AsyncSession, operations: list[BatchOperationModel]
+) -> list[ResponseMenuModel | None]:
+    ids = await allocate_ids(db, Menu, len(operations))
+    rows = unnest(
+        id=(ids, Integer),
+        title=(data_values(operations, "title"), String),
+        description=(data_values(operations, "description"), String),
+    )
+    result = await db.execute(
+        insert(Menu)
+        .from_select(["id", "title", "description"], select(rows))
+        .returning(Menu.id, Menu.title, Menu.description)
+    )
+    created = {row.id: ResponseMenuModel.from_orm(row) for row in result.all()}
+    return [created.get(item_id) for item_id in ids]
+
+
+async def batch_create_submenus(
+    db: AsyncSession, operations: list[BatchOperationModel]
+) -> list[ResponseSubmenuModel | None]:
+    ids = await allocate_ids(db, Submenu, len(operations))
+    rows = unnest(
+        id=(ids, Integer),
+        title=(data_values(operations, "title"), String),
+        description=(data_values(operations, "description"), String),
+        menu_id=([operation.menu_id for operation in operations], Integer),
+    )
+    result = await db.execute(
+        insert(Submenu)
+        .from_select(
+            ["id", "title", "description", "menu_id"],
+            select(rows).join(Menu, Menu.id == rows.c.menu_id),
         )
-        .join(
-            Submenu,
+        .returning(Submenu.id, Submenu.title, Submenu.description, Submenu.menu_id)
+    )
+    rows = result.all()
+    await add_to_counters(
+        db, Menu, submenus_counter=count_changes((row.menu_id, 1) for row in rows)
+    )
+    created = {row.id: ResponseSubmenuModel.from_orm(row) for row in rows}
+    return [created.get(item_id) for item_id in ids]
+
+
+async def batch_create_dishes(
+    db: AsyncSession, operations: list[BatchOperationModel]
+) -> list[ResponseDishModel | None]:
+    ids = await allocate_ids(db, Dish, len(operations))
+    rows = unnest(
+        id=(ids, Integer),
+        title=(data_values(operations, "title"), String),
+        description=(data_values(operations, "description"), String),
+        price=(data_values(operations, "price"), Dish.price.type),
+        submenu_id=([operation.submenu_id for operation in operations], Integer),
+        menu_id=([operation.menu_id for operation in operations], Integer),
+    )
+    result = await db.execute(
+        insert(Dish)
+        .from_select(
+            ["id", "title", "description", "price", "submenu_id"],
+            select(
+                rows.c.id,
+                rows.c.title,
+                rows.c.description,
+                rows.c.price,
+                rows.c.submenu_id,
+            ).join(
+                Submenu,
+                (Submenu.id == rows.c.submenu_id) & (Submenu.menu_id == rows.c.menu_id),
+            ),
         )
-        .filter(
-            Submenu.id == submenu_id,
-            Submenu.menu_id == menu_id,
-            Dish.id == dish_id,
+        .returning(Dish.id, Dish.title, Dish.description, Dish.price, Dish.submenu_id)
+    )
+    rows = result.all()
+    menu_ids = {operation.submenu_id: operation.menu_id for operation in operations}
+    await add_to_counters(
+        db, Submenu, dishes_counter=count_changes((row.submenu_id, 1) for row in rows)
+    )
+    await add_to_counters(
+        db,
+        Menu,
+        dishes_counter=count_changes((menu_ids[row.submenu_id], 1) for row in rows),
+    )
+    created = {row.id: ResponseDishModel.from_orm(row) for row in rows}
+    return [created.get(item_id) for item_id in ids]
+
+
+async def batch_update_menus(
+    db: AsyncSession, operations: list[BatchOperationModel]
+) -> list[ResponseMenuModel | None]:
+    rows = unnest(
+        id=([operation.id for operation in operations], Integer),
+        title=(changed_values(operations, "title"), String),
+        description=(changed_values(operations, "description"), String),
+    )
+    result = await db.execute(
+        update(Menu)
+        .where(Menu.id == rows.c.id)
+        .values(
+            title=func.coalesce(rows.c.title, Menu.title),
+            description=func.coalesce(rows.c.description, Menu.description),
+        )
+        .returning(Menu.id, Menu.title, Menu.description)
+        .execution_options(synchronize_session=False)
+    )
+    updated = {row.id: ResponseMenuModel.from_orm(row) for row in result.all()}
+    return [updated.get(operation.id) for operation in operations]
+
+
+async def batch_update_submenus(
+    db: AsyncSession, operations: list[BatchOperationModel]
+) -> list[ResponseSubmenuModel | None]:
+    rows = unnest(
+        id=([operation.id for operation in operations], Integer),
+        title=(changed_values(operations, "title"), String),
+        description=(changed_values(operations, "description"), String),
+        menu_id=([operation.menu_id for operation in operations], Integer),
+    )
+    result = await db.execute(
+        update(Submenu)
+        .where(Submenu.id == rows.c.id, Submenu.menu_id == rows.c.menu_id)
+        .values(
+            title=func.coalesce(rows.c.title, Submenu.title),
+            description=func.coalesce(rows.c.description, Submenu.description),
+        )
+        .returning(Submenu.id, Submenu.title, Submenu.description)
+        .execution_options(synchronize_session=False)
+    )
+    updated = {row.id: ResponseSubmenuModel.from_orm(row) for row in result.all()}
+    return [updated.get(operation.id) for operation in operations]
+
+
+async def batch_update_dishes(
+    db: AsyncSession, operations: list[BatchOperationModel]
+) -> list[ResponseDishModel | None]:
+    rows = unnest(
+        id=([operation.id for operation in operations], Integer),
+        title=(changed_values(operations, "title"), String),
+        description=(changed_values(operations, "description"), String),
+        price=(changed_values(operations, "price"), Dish.price.type),
+        submenu_id=([operation.submenu_id for operation in operations], Integer),
+        menu_id=([operation.menu_id for operation in operations], Integer),
+    )
+    result = await db.execute(
+        update(Dish)
+        .where(
+            Dish.id == rows.c.id,
+            Dish.submenu_id == rows.c.submenu_id,
+            Submenu.id == Dish.submenu_id,
+            Submenu.menu_id == rows.c.menu_id,
+        )
+        .values(
+            title=func.coalesce(rows.c.title, Dish.title),
+            description=func.coalesce(rows.c.description, Dish.description),
+            price=func.coalesce(rows.c.price, Dish.price),
+        )
+        .returning(Dish.id, Dish.title, Dish.description, Dish.price)
+        .execution_options(synchronize_session=False)
+    )
+    updated = {row.id: ResponseDishModel.from_orm(row) for row in result.all()}
+    return [updated.get(operation.id) for operation in operations]
+
+
+async def batch_delete_menus(
+    db: AsyncSession, operations: list[BatchOperationModel]
+) -> list[ResponseMenuModel | None]:
+    ids = [operation.id for operation in operations]
+    result = await db.execute(
+        delete(Menu)
+        .where(Menu.id == any_(cast(ids, ARRAY(Integer))))
+        .returning(Menu.id, Menu.title, Menu.description)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = {row.id: ResponseMenuModel.from_orm(row) for row in result.all()}
+    return [deleted.get(item_id) for item_id in ids]
+
+
+async def batch_delete_submenus(
+    db: AsyncSession, operations: list[BatchOperationModel]
+) -> list[ResponseSubmenuModel | None]:
+    rows = unnest(
+        id=([operation.id for operation in operations], Integer),
+        menu_id=([operation.menu_id for operation in operations], Integer),
+    )
+    result = await db.execute(
+        delete(Submenu)
+        .where(Submenu.id == rows.c.id, Submenu.menu_id == rows.c.menu_id)
+        .returning(
+            Submenu.id,
+            Submenu.title,
+            Submenu.description,
+            Submenu.dishes_counter,
+            Submenu.menu_id,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await add_to_counters(
+        db,
+        Menu,
+        submenus_counter=count_changes((row.menu_id, -1) for row in rows),
+        dishes_counter=count_changes(
+            (row.menu_id, -row.dishes_counter) for row in rows
+        ),
+    )
+    deleted = {row.id: ResponseSubmenuModel.from_orm(row) for row in rows}
+    return [deleted.get(operation.id) for operation in operations]
+
+
+async def batch_delete_dishes(
+    db: AsyncSession, operations: list[BatchOperationModel]
+) -> list[ResponseDishModel | None]:
+    rows = unnest(
+        id=([operation.id for operation in operations], Integer),
+        submenu_id=([operation.submenu_id for operation in operations], Integer),
+        menu_id=([operation.menu_id for operation in operations], Integer),
+    )
+    result = await db.execute(
+        delete(Dish)
+        .where(
+            Dish.id == rows.c.id,
+            Dish.submenu_id == rows.c.submenu_id,
+            Submenu.id == Dish.submenu_id,
+            Submenu.menu_id == rows.c.menu_id,
+        )
+        .returning(
+            Dish.id,
+            Dish.title,
+            Dish.description,
+            Dish.price,
+            Dish.submenu_id,
+            Submenu.menu_id,
         )
-        .limit(1),
-    )
-    dish = dish.scalar()
-    if dish:
-        await db.delete(dish)
-        await db.commit()
-        return ResponseDishModel.from_orm(dish)
-    return None
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await add_to_counters(
+        db, Submenu, dishes_counter=count_changes((row.submenu_id, -1) for row in rows)
+    )
+    await add_to_counters(
+        db, Menu, dishes_counter=count_changes((row.menu_id, -1) for row in rows)
+    )
+    deleted = {row.id: ResponseDishModel.from_orm(row) for row in rows}
+    return [deleted.get(operation.id) for operation in operations]
+
+
+# Parents are created before children and deleted after them. BatchModel rejects
+# batches whose result would depend on the order of their operations.
+BATCH_HANDLERS = {
+    ("create", "menu"): batch_create_menus,
+    ("create", "submenu"): batch_create_submenus,
+    ("create", "dish"): batch_create_dishes,
+    ("update", "menu"): batch_update_menus,
+    ("update", "submenu"): batch_update_submenus,
+    ("update", "dish"): batch_update_dishes,
+    ("delete", "dish"): batch_delete_dishes,
+    ("delete", "submenu"): batch_delete_submenus,
+    ("delete", "menu"): batch_delete_menus,
+}
+
+
+async def run_batch(db: AsyncSession, operations: list[BatchOperationModel]) -> list:
+    results = [None] * len(operations)
+    for key, handler in BATCH_HANDLERS.items():
+        indexes = [
+            index
+            for index, operation in enumerate(operations)
+            if (operation.action, operation.target) == key
+        ]
+        if indexes:
+            items = await handler(db, [operations[index] for index in indexes])
+            for index, item in zip(indexes, items):
+                results[index] = item
+    await db.commit()
+    return results
+
+
+COPY_COLUMNS = {
+    "menus": ["id", "title", "description", "submenus_counter", "dishes_counter"],
+    "submenus": ["id", "title", "description", "dishes_counter", "menu_id"],
+    "dishes": ["id", "title", "description", "price", "submenu_id"],
+}
+
+
+async def copy_menu_trees(
+    db: AsyncSession, menus: list[MenuTreeModel]
+) -> dict[str, list[int]]:
+    submenus = [submenu for menu in menus for submenu in menu.submenus]
+    dishes = [dish for submenu in submenus for dish in submenu.dishes]
+    # Allocating IDs also opens the transaction the COPYs below run in.
+    menu_ids = await allocate_ids(db, Menu, len(menus))
+    submenu_ids = await allocate_ids(db, Submenu, len(submenus)) if submenus else []
+    dish_ids = await allocate_ids(db, Dish, len(dishes)) if dishes else []
+
+    menu_records, submenu_records, dish_records = [], [], []
+    submenu_id, dish_id = iter(submenu_ids), iter(dish_ids)
+    for menu, menu_id in zip(menus, menu_ids):
+        dishes_counter = 0
+        for submenu in menu.submenus:
+            parent_id = next(submenu_id)
+            submenu_records.append(
+                (
+                    parent_id,
+                    submenu.title,
+                    submenu.description,
+                    len(submenu.dishes),
+                    menu_id,
+                )
+            )
+            dishes_counter += len(submenu.dishes)
+            for dish in submenu.dishes:
+                dish_records.append(
+                    (
+                        next(dish_id),
+                        dish.title,
+                        dish.description,
+                        Decimal(str(dish.price)),
+                        parent_id,
+                    )
+                )
+        menu_records.append(
+            (menu_id, menu.title, menu.description, len(menu.submenus), dishes_counter)
+        )
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    for table, records in (
+        (Menu.__table__, menu_records),
+        (Submenu.__table__, submenu_records),
+        (Dish.__table__, dish_records),
+    ):
+        if records:
+            await driver_connection.copy_records_to_table(
+                table.name,
+                records=records,
+                columns=COPY_COLUMNS[table.name],
+            )
+    return {"menu": menu_ids, "submenu": submenu_ids, "dish": dish_ids}
+
+
+async def get_ids(db: AsyncSession, model) -> list[int]:
+    result = await db.execute(select(model.id))
+    return list(result.scalars().all())
 
 
 async def get_all_data(db: AsyncSession):  # add type hinting
@@ -1,7 +1,19 @@
+import asyncio
 import os
+from collections.abc import Callable
 
-from sqlalchemy import Column, ForeignKey, Integer, Numeric, String
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    func,
+    literal_column,
+    text,
+)
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import (
     DeclarativeMeta,
     backref,
@@ -10,14 +22,44 @@ from sqlalchemy.orm import (
     sessionmaker,
 )
 
+from app.instrumentation import DB_ECHO, instrument
+
 DB_USER = os.environ.get("DB_USER")
 DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_URL = os.environ.get("DB_URL")
 DB_NAME = os.environ.get("DB_NAME")
 
-DB_CONFIG = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_URL}/{DB_NAME}"
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+
+DB_REPLICA_URLS = [
+    url for url in os.environ.get("DB_REPLICA_URLS", "").split(",") if url.strip()
+]
+DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", 5))
+DB_REPLICA_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", 2))
+
+DB_QUERY_CACHE_SIZE = int(os.environ.get("DB_QUERY_CACHE_SIZE", 500))
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(
+    os.environ.get("DB_PREPARED_STATEMENT_CACHE_SIZE", 500)
+)
+
 
-engine = create_async_engine(DB_CONFIG, echo=True)
+def database_url(host: str) -> str:
+    return (
+        f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{host}/{DB_NAME}"
+        f"?prepared_statement_cache_size={DB_PREPARED_STATEMENT_CACHE_SIZE}"
+    )
+
+
+DB_CONFIG = database_url(DB_URL)
+
+engine = create_async_engine(
+    DB_CONFIG,
+    echo=DB_ECHO,
+    query_cache_size=DB_QUERY_CACHE_SIZE,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -27,15 +69,129 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+
+class LazySession:
+    def __init__(
+        self, factory: Callable[[], AsyncSession], reads_own_writes: bool = False
+    ) -> None:
+        self._factory = factory
+        # Set for clients that wrote recently, their reads skip replica-filled cache.
+        self.reads_own_writes = reads_own_writes
+        self._session: AsyncSession | None = None
+        self._closed = False
+
+    def __getattr__(self, name: str):
+        if self._session is None:
+            if self._closed:
+                raise RuntimeError("Session used after the request finished")
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._session is not None:
+            session, self._session = self._session, None
+            await session.close()
+
+
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE("
+    "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaPool:
+    def __init__(self, engines: list[AsyncEngine]) -> None:
+        self.engines = engines
+        self.healthy: list[AsyncEngine] = []
+        self._next = 0
+        self._checker: asyncio.Task | None = None
+
+    def session(self) -> AsyncSession | None:
+        if not self.healthy:
+            return None
+        engine = self.healthy[self._next % len(self.healthy)]
+        self._next += 1
+        session = SessionLocal(bind=engine)
+        session.info["replica"] = True
+        return session
+
+    @staticmethod
+    async def is_healthy(engine: AsyncEngine) -> bool:
+        try:
+            async with engine.connect() as conn:
+                lag = await asyncio.wait_for(
+                    conn.scalar(REPLICA_LAG_QUERY), DB_REPLICA_CHECK_INTERVAL
+                )
+            return lag <= DB_REPLICA_MAX_LAG
+        except Exception as ex:
+            print(ex)
+            return False
+
+    async def check(self) -> None:
+        results = await asyncio.gather(*map(self.is_healthy, self.engines))
+        self.healthy = [
+            engine for engine, healthy in zip(self.engines, results) if healthy
+        ]
+
+    async def run_checks(self) -> None:
+        while True:
+            await asyncio.sleep(DB_REPLICA_CHECK_INTERVAL)
+            await self.check()
+
+    async def start(self) -> None:
+        if self.engines and self._checker is None:
+            await self.check()
+            self._checker = asyncio.create_task(self.run_checks())
+
+    async def stop(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            try:
+                await self._checker
+            except asyncio.CancelledError:
+                pass
+            self._checker = None
+
+
+replicas = ReplicaPool(
+    [
+        create_async_engine(
+            database_url(url.strip()),
+            echo=DB_ECHO,
+            query_cache_size=DB_QUERY_CACHE_SIZE,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+        for url in DB_REPLICA_URLS
+    ]
+)
+
+for instrumented in (engine, *replicas.engines):
+    instrument(instrumented.sync_engine)
+
+SEARCH_CONFIG = "russian"
+
 Base: DeclarativeMeta = declarative_base()
 
 
+def search_vector(title, description):
+    # Searches must repeat the indexed expression exactly for the GIN index to apply.
+    return func.to_tsvector(
+        literal_column(f"'{SEARCH_CONFIG}'"),
+        title + literal_column("' '") + description,
+    )
+
+
 class Menu(Base):
     __tablename__ = "menus"
 
     id = Column(Integer(), primary_key=True)
     title = Column(String(), nullable=False)
     description = Column(String(), nullable=False)
+    submenus_counter = Column(Integer(), nullable=False, server_default="0")
+    dishes_counter = Column(Integer(), nullable=False, server_default="0")
 
 
 class Submenu(Base):
@@ -44,16 +200,27 @@ class Submenu(Base):
     id = Column(Integer(), primary_key=True)
     title = Column(String(), nullable=False)
     description = Column(String(), nullable=False)
-    menu_id = Column(Integer(), ForeignKey("menus.id"))
+    dishes_counter = Column(Integer(), nullable=False, server_default="0")
+    menu_id = Column(Integer(), ForeignKey("menus.id", ondelete="CASCADE"))
     menu = relationship(
         "Menu",
         backref=backref(
             "submenus",
             cascade="all,delete",
+            passive_deletes=True,
         ),
         foreign_keys=[menu_id],
     )
 
+    __table_args__ = (
+        Index("ix_submenus_menu_id_id", "menu_id", "id"),
+        Index(
+            "ix_submenus_search",
+            search_vector(title, description),
+            postgresql_using="gin",
+        ),
+    )
+
 
 class Dish(Base):
     __tablename__ = "dishes"
@@ -62,17 +229,32 @@ class Dish(Base):
     title = Column(String(), nullable=False)
     description = Column(String(), nullable=False)
     price = Column(Numeric(10, 2), nullable=False)
-    submenu_id = Column(Integer(), ForeignKey("submenus.id"))
+    submenu_id = Column(Integer(), ForeignKey("submenus.id", ondelete="CASCADE"))
     submenu = relationship(
         "Submenu",
         backref=backref(
             "dishes",
             cascade="all,delete",
+            passive_deletes=True,
         ),
         foreign_keys=[submenu_id],
     )
 
+    __table_args__ = (
+        Index("ix_dishes_submenu_id_id", "submenu_id", "id"),
+        Index("ix_dishes_submenu_id_price_id", "submenu_id", "price", "id"),
+        Index("ix_dishes_price_id", "price", "id"),
+        Index("ix_dishes_title_id", "title", "id"),
+        Index(
+            "ix_dishes_search",
+            search_vector(title, description),
+            postgresql_using="gin",
+        ),
+    )
+
 
 async def create_tables():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Imported here, the migrations read the search config from this module.
+    from app.migrations import migrate
+
+    await migrate(engine, Base.metadata)
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DB_ECHO = os.environ.get("DB_ECHO", "false").lower() == "true"
+DB_SLOW_QUERY_TIME = float(os.environ.get("DB_SLOW_QUERY_TIME", 200))
+DB_QUERY_SAMPLE_RATE = float(os.environ.get("DB_QUERY_SAMPLE_RATE", 0.01))
+# Statistics show SQL text, they are only served where the API isn't public.
+DB_QUERY_STATS_ENABLED = (
+    os.environ.get("DB_QUERY_STATS_ENABLED", "false").lower() == "true"
+)
+
+logger = logging.getLogger("app.sql")
+
+current_scope: ContextVar[dict | None] = ContextVar("current_scope", default=None)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s|\$\d+")
+PLACEHOLDER_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class QueryStats:
+    statement: str
+    count: int = 0
+    total_time: float = 0
+    max_time: float = 0
+
+
+query_stats: dict[str, QueryStats] = {}
+
+
+def normalize(statement: str) -> str:
+    statement = LITERALS.sub("?", statement)
+    statement = PLACEHOLDER_LISTS.sub("?", statement)
+    return WHITESPACE.sub(" ", statement).strip()
+
+
+def fingerprint(statement: str) -> str:
+    return hashlib.md5(statement.encode()).hexdigest()[:16]
+
+
+def current_route() -> str | None:
+    scope = current_scope.get()
+    if scope is None:
+        return None
+    # The router adds the endpoint to the scope once the request has been matched.
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        return endpoint.__name__
+    return f"{scope['method']} {scope['path']}"
+
+
+def record(statement: str, duration: float, rows: int | None) -> None:
+    is_slow = duration >= DB_SLOW_QUERY_TIME
+    is_sampled = random.random() < DB_QUERY_SAMPLE_RATE
+    if not is_slow and not is_sampled:
+        return
+    normalized = normalize(statement)
+    key = fingerprint(normalized)
+    if is_sampled:
+        stats = query_stats.setdefault(key, QueryStats(statement=normalized))
+        stats.count += 1
+        stats.total_time += duration
+        stats.max_time = max(stats.max_time, duration)
+    if is_slow:
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "fingerprint": key,
+                    "statement": normalized,
+                    "duration_ms": round(duration, 3),
+                    "rows": rows,
+                    "route": current_route(),
+                },
+                ensure_ascii=False,
+            )
+        )
+
+
+def get_query_stats(limit: int = 20) -> list[dict]:
+    # Counts are sampled, scale them back up to estimate the real totals.
+    scale = 1 / DB_QUERY_SAMPLE_RATE if DB_QUERY_SAMPLE_RATE > 0 else 0
+    return [
+        {
+            "fingerprint": key,
+            "statement": stats.statement,
+            "estimated_count": round(stats.count * scale),
+            "estimated_total_ms": round(stats.total_time * scale, 3),
+            "mean_ms": round(stats.total_time / stats.count, 3),
+            "max_ms": round(stats.max_time, 3),
+        }
+        for key, stats in sorted(
+            query_stats.items(), key=lambda item: item[1].total_time, reverse=True
+        )[:limit]
+    ]
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def row_count(cursor) -> int | None:
+    if cursor.rowcount >= 0:
+        return cursor.rowcount
+    # The driver only reports a row count for INSERT, UPDATE and DELETE, a SELECT
+    # has already been fetched into the adapted cursor unless it is server side.
+    rows = getattr(cursor, "_rows", None)
+    if rows is None or getattr(cursor, "server_side", False):
+        return None
+    return len(rows)
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+    record(statement, (time.perf_counter() - start) * 1000, row_count(cursor))
+
+
+def handle_error(context) -> None:
+    starts = context.connection.info.get("query_start") if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
@@ -1,20 +1,81 @@
-from fastapi import FastAPI, Request, Response
+import math
+import os
+import time
 
-from app.database import SessionLocal
+from fastapi import FastAPI, Request
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.database import DB_REPLICA_MAX_LAG, LazySession, SessionLocal, replicas
+from app.instrumentation import current_scope
 from app.routes import router
 
+# Replica-filled cache entries live up to DB_REPLICA_MAX_LAG and may be filled up to
+# DB_REPLICA_MAX_LAG after a write, the client has to read the primary until then.
+DB_REPLICA_STICKY_TIME = float(
+    os.environ.get("DB_REPLICA_STICKY_TIME", 2 * DB_REPLICA_MAX_LAG)
+)
+PRIMARY_COOKIE = "db_primary_until"
+READ_METHODS = {"GET", "HEAD"}
+
 app = FastAPI()
 
 
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
-    response = Response("Internal server error", status_code=500)
+def reads_primary(request: Request) -> bool:
     try:
-        request.state.db = SessionLocal()
-        response = await call_next(request)
-    finally:
-        await request.state.db.close()
-    return response
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def open_session(request: Request):
+    # Clients read their own writes from the primary until replicas caught up.
+    if request.method in READ_METHODS and not reads_primary(request):
+        session = replicas.session()
+        if session is not None:
+            return session
+    return SessionLocal()
+
+
+def primary_cookie() -> str:
+    return (
+        f"{PRIMARY_COOKIE}={time.time() + DB_REPLICA_STICKY_TIME}; "
+        f"Max-Age={math.ceil(DB_REPLICA_STICKY_TIME)}; HttpOnly; Path=/; SameSite=lax"
+    )
+
+
+class DBSessionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        # Slow-query logs look the route up from here.
+        current_scope.set(scope)
+        # Cache hits never open the session, so they never check out a connection.
+        session = LazySession(
+            lambda: open_session(request),
+            reads_own_writes=bool(replicas.engines) and reads_primary(request),
+        )
+        scope.setdefault("state", {})["db"] = session
+        sticky = bool(replicas.engines) and request.method not in READ_METHODS
+
+        async def send_response(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # The handler is done, give the connection back before the body is sent.
+                await session.close()
+                if sticky and message["status"] < 400:
+                    MutableHeaders(scope=message).append("set-cookie", primary_cookie())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_response)
+        finally:
+            await session.close()
 
 
+app.add_middleware(DBSessionMiddleware)
 app.include_router(router=router, prefix="/api/v1")
@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import json
+import sys
+from collections.abc import AsyncIterator
+
+from app import crud
+from app.bulk_import import import_menu_trees, iter_ndjson
+from app.database import SessionLocal, create_tables
+
+
+async def recount(args: argparse.Namespace) -> None:
+    async with SessionLocal() as db:
+        await crud.recount_counters(
+            db=db, menu_ids=args.menu_ids, submenu_ids=args.submenu_ids
+        )
+        await db.commit()
+
+
+async def migrate(args: argparse.Namespace) -> None:
+    await create_tables()
+
+
+async def read_lines(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") if path != "-" else sys.stdin.buffer as file:
+        for line in file:
+            yield line
+
+
+async def read_document(path: str) -> AsyncIterator[dict]:
+    with open(path, "rb") if path != "-" else sys.stdin.buffer as file:
+        menus = json.load(file)["data"]
+    for menu in menus:
+        yield menu
+
+
+async def import_trees(args: argparse.Namespace) -> None:
+    trees = (
+        read_document(args.path)
+        if args.document
+        else iter_ndjson(read_lines(args.path))
+    )
+    async with SessionLocal() as db:
+        print(await import_menu_trees(db=db, trees=trees))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser(
+        "migrate", help="create missing tables and apply pending migrations"
+    )
+    migrate_parser.set_defaults(handler=migrate)
+
+    recount_parser = commands.add_parser(
+        "recount", help="recalculate menu and submenu counters from the tables"
+    )
+    recount_parser.add_argument("--menu-ids", type=int, nargs="+")
+    recount_parser.add_argument("--submenu-ids", type=int, nargs="+")
+    recount_parser.set_defaults(handler=recount)
+
+    import_parser = commands.add_parser(
+        "import", help="bulk import menu trees, one JSON menu per line"
+    )
+    import_parser.add_argument("path", help="file to read, - for stdin")
+    import_parser.add_argument(
+        "--document",
+        action="store_true",
+        help='read a single {"data": [...]} document like test_data.json',
+    )
+    import_parser.set_defaults(handler=import_trees)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import time
+from collections import OrderedDict
+
+
+def to_bytes(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+class MemoryRedis:
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._items: OrderedDict = OrderedDict()
+
+    def _get(self, name: str):
+        item = self._items.get(name)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._items[name]
+            return None
+        self._items.move_to_end(name)
+        return item
+
+    def _set(self, name: str, value, expires_at: float | None) -> None:
+        self._items[name] = (expires_at, value)
+        self._items.move_to_end(name)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    async def get(self, name: str) -> bytes | None:
+        item = self._get(name)
+        return None if item is None else bytes(item[1])
+
+    async def mget(self, names: list[str]) -> list[bytes | None]:
+        return [await self.get(name) for name in names]
+
+    async def set(
+        self,
+        name: str,
+        value,
+        ex: int | None = None,
+        px: int | None = None,
+        nx: bool = False,
+        keepttl: bool = False,
+    ) -> bool | None:
+        item = self._get(name)
+        if nx and item is not None:
+            return None
+        expires_at = None
+        if keepttl and item is not None:
+            expires_at = item[0]
+        elif ex is not None:
+            expires_at = time.monotonic() + ex
+        elif px is not None:
+            expires_at = time.monotonic() + px / 1000
+        self._set(name, to_bytes(value), expires_at)
+        return True
+
+    async def delete(self, *names: str) -> int:
+        return sum(self._items.pop(name, None) is not None for name in names)
+
+    async def exists(self, *names: str) -> int:
+        return sum(self._get(name) is not None for name in names)
+
+    async def expire(self, name: str, seconds: int) -> bool:
+        item = self._get(name)
+        if item is None:
+            return False
+        self._set(name, item[1], time.monotonic() + seconds)
+        return True
+
+    async def incr(self, name: str) -> int:
+        item = self._get(name)
+        value = int(item[1]) + 1 if item else 1
+        self._set(name, to_bytes(value), item[0] if item else None)
+        return value
+
+    async def getbit(self, name: str, offset: int) -> int:
+        item = self._get(name)
+        if item is None or offset // 8 >= len(item[1]):
+            return 0
+        return item[1][offset // 8] >> (7 - offset % 8) & 1
+
+    async def setbit(self, name: str, offset: int, value: int) -> int:
+        item = self._get(name)
+        bits = bytearray(item[1]) if item else bytearray()
+        if offset // 8 >= len(bits):
+            bits.extend(bytes(offset // 8 + 1 - len(bits)))
+        previous = bits[offset // 8] >> (7 - offset % 8) & 1
+        mask = 1 << (7 - offset % 8)
+        bits[offset // 8] = (
+            bits[offset // 8] | mask if value else bits[offset // 8] & ~mask
+        )
+        self._set(name, bytes(bits), item[0] if item else None)
+        return previous
+
+    async def bitop(self, operation: str, dest: str, *names: str) -> int:
+        # Only OR is supported, it is all the membership filter rebuild needs.
+        if operation.upper() != "OR":
+            raise ValueError(f"Unsupported BITOP operation: {operation}")
+        values = [item[1] for item in map(self._get, names) if item is not None]
+        size = max((len(value) for value in values), default=0)
+        bits = bytearray(size)
+        for value in values:
+            for index, byte in enumerate(value):
+                bits[index] |= byte
+        self._set(dest, bytes(bits), None)
+        return size
+
+    async def publish(self, channel: str, message) -> int:
+        # A single process has no other workers to notify.
+        return 0
+
+    def pipeline(self, transaction: bool = True) -> "MemoryPipeline":
+        return MemoryPipeline(self, immediate=False)
+
+    async def transaction(self, func, *watches: str) -> list:
+        pipe = MemoryPipeline(self, immediate=True)
+        await func(pipe)
+        return await pipe.execute()
+
+
+class MemoryPipeline:
+    COMMANDS = {
+        "get",
+        "mget",
+        "set",
+        "delete",
+        "exists",
+        "incr",
+        "expire",
+        "getbit",
+        "setbit",
+        "bitop",
+        "publish",
+    }
+
+    def __init__(self, redis: MemoryRedis, immediate: bool) -> None:
+        self._redis = redis
+        self._immediate = immediate
+        self._commands: list = []
+
+    def __getattr__(self, name: str):
+        if name not in self.COMMANDS:
+            raise AttributeError(name)
+        command = getattr(self._redis, name)
+        if self._immediate:
+            return command
+
+        def queue(*args, **kwargs) -> "MemoryPipeline":
+            self._commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    def multi(self) -> None:
+        self._immediate = False
+
+    async def execute(self) -> list:
+        commands, self._commands = self._commands, []
+        return [await command(*args, **kwargs) for command, args, kwargs in commands]
+
+    async def __aenter__(self) -> "MemoryPipeline":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self._commands = []
@@ -0,0 +1,223 @@
+import asyncio
+import os
+from dataclasses import dataclass
+
+from sqlalchemy import MetaData, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import SEARCH_CONFIG
+
+DB_MIGRATE_ON_STARTUP = (
+    os.environ.get("DB_MIGRATE_ON_STARTUP", "true").lower() == "true"
+)
+MIGRATIONS_LOCK_ID = 7_420_001
+MIGRATIONS_LOCK_POLL_TIME = 1.0
+# Same expression as database.search_vector, the index is only used when they match.
+SEARCH_VECTOR = f"to_tsvector('{SEARCH_CONFIG}', title || ' ' || description)"
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: tuple[str, ...]
+    # Statements commit one by one: CREATE INDEX CONCURRENTLY can't run inside a
+    # transaction block, and VALIDATE CONSTRAINT must not keep the ADD's lock.
+    concurrent: bool = False
+    # Index builds are skipped when a valid index of this name already exists.
+    index: str | None = None
+
+
+def create_index_concurrently(
+    name: str, table: str, columns: str, using: str = "btree"
+) -> tuple[str, ...]:
+    # A failed concurrent build leaves an invalid index behind, drop it on retry.
+    return (
+        f"DROP INDEX CONCURRENTLY IF EXISTS {name}",
+        f"CREATE INDEX CONCURRENTLY {name} ON {table} USING {using} ({columns})",
+    )
+
+
+def index_migration(
+    version: int, name: str, index: str, table: str, columns: str, using: str = "btree"
+) -> Migration:
+    return Migration(
+        version=version,
+        name=name,
+        statements=create_index_concurrently(index, table, columns, using),
+        concurrent=True,
+        index=index,
+    )
+
+
+MIGRATIONS = (
+    Migration(
+        version=1,
+        name="add_counters",
+        statements=(
+            "ALTER TABLE menus "
+            "ADD COLUMN IF NOT EXISTS submenus_counter INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE menus "
+            "ADD COLUMN IF NOT EXISTS dishes_counter INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE submenus "
+            "ADD COLUMN IF NOT EXISTS dishes_counter INTEGER NOT NULL DEFAULT 0",
+            "UPDATE submenus SET dishes_counter = "
+            "(SELECT count(*) FROM dishes WHERE dishes.submenu_id = submenus.id)",
+            "UPDATE menus SET "
+            "submenus_counter = "
+            "(SELECT count(*) FROM submenus WHERE submenus.menu_id = menus.id), "
+            "dishes_counter = (SELECT coalesce(sum(dishes_counter), 0) "
+            "FROM submenus WHERE submenus.menu_id = menus.id)",
+        ),
+    ),
+    index_migration(
+        version=2,
+        name="index_submenus_menu_id",
+        index="ix_submenus_menu_id_id",
+        table="submenus",
+        columns="menu_id, id",
+    ),
+    index_migration(
+        version=3,
+        name="index_dishes_submenu_id",
+        index="ix_dishes_submenu_id_id",
+        table="dishes",
+        columns="submenu_id, id",
+    ),
+    Migration(
+        version=4,
+        name="cascade_deletes",
+        # NOT VALID skips the table scan while the ALTER holds its lock, the rows
+        # are checked afterwards by VALIDATE, which lets reads and writes through.
+        statements=(
+            "ALTER TABLE submenus "
+            "DROP CONSTRAINT IF EXISTS submenus_menu_id_fkey, "
+            "ADD CONSTRAINT submenus_menu_id_fkey FOREIGN KEY (menu_id) "
+            "REFERENCES menus (id) ON DELETE CASCADE NOT VALID",
+            "ALTER TABLE submenus VALIDATE CONSTRAINT submenus_menu_id_fkey",
+            "ALTER TABLE dishes "
+            "DROP CONSTRAINT IF EXISTS dishes_submenu_id_fkey, "
+            "ADD CONSTRAINT dishes_submenu_id_fkey FOREIGN KEY (submenu_id) "
+            "REFERENCES submenus (id) ON DELETE CASCADE NOT VALID",
+            "ALTER TABLE dishes VALIDATE CONSTRAINT dishes_submenu_id_fkey",
+        ),
+        concurrent=True,
+    ),
+    # Expression indexes instead of stored generated columns: adding one of those
+    # rewrites the whole table under an ACCESS EXCLUSIVE lock.
+    index_migration(
+        version=5,
+        name="index_submenus_search",
+        index="ix_submenus_search",
+        table="submenus",
+        columns=SEARCH_VECTOR,
+        using="gin",
+    ),
+    index_migration(
+        version=6,
+        name="index_dishes_search",
+        index="ix_dishes_search",
+        table="dishes",
+        columns=SEARCH_VECTOR,
+        using="gin",
+    ),
+    index_migration(
+        version=7,
+        name="index_dishes_submenu_id_price",
+        index="ix_dishes_submenu_id_price_id",
+        table="dishes",
+        columns="submenu_id, price, id",
+    ),
+    index_migration(
+        version=8,
+        name="index_dishes_price",
+        index="ix_dishes_price_id",
+        table="dishes",
+        columns="price, id",
+    ),
+    index_migration(
+        version=9,
+        name="index_dishes_title",
+        index="ix_dishes_title_id",
+        table="dishes",
+        columns="title, id",
+    ),
+)
+
+
+async def get_applied_versions(conn) -> set[int]:
+    await conn.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR NOT NULL, "
+            "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        )
+    )
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return set(result.scalars().all())
+
+
+async def record_migration(conn, migration: Migration) -> None:
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+        {"version": migration.version, "name": migration.name},
+    )
+
+
+async def is_index_built(conn, migration: Migration) -> bool:
+    if migration.index is None:
+        return False
+    result = await conn.execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": migration.index},
+    )
+    return bool(result.scalar())
+
+
+async def apply_migration(engine: AsyncEngine, migration: Migration) -> None:
+    if migration.concurrent:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if await is_index_built(conn, migration):
+                await record_migration(conn, migration)
+                print(f"Skipped migration {migration.version} {migration.name}")
+                return
+            for statement in migration.statements:
+                await conn.execute(text(statement))
+            await record_migration(conn, migration)
+    else:
+        async with engine.begin() as conn:
+            for statement in migration.statements:
+                await conn.execute(text(statement))
+            await record_migration(conn, migration)
+    print(f"Applied migration {migration.version} {migration.name}")
+
+
+async def acquire_lock(conn) -> None:
+    # Every worker runs migrations on startup, only one of them may migrate at a time.
+    # Waiters poll instead of blocking in pg_advisory_lock: a blocked query keeps a
+    # snapshot open, and CREATE INDEX CONCURRENTLY would wait for it forever.
+    while not await conn.scalar(
+        text("SELECT pg_try_advisory_lock(:id)"), {"id": MIGRATIONS_LOCK_ID}
+    ):
+        await asyncio.sleep(MIGRATIONS_LOCK_POLL_TIME)
+
+
+async def migrate(engine: AsyncEngine, metadata: MetaData) -> None:
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        await acquire_lock(lock_conn)
+        try:
+            async with engine.begin() as conn:
+                # Fresh databases get the current schema, the index migrations are only
+                # recorded and the rest are written to be harmless on it.
+                await conn.run_sync(metadata.create_all)
+                applied = await get_applied_versions(conn)
+            for migration in MIGRATIONS:
+                if migration.version not in applied:
+                    await apply_migration(engine, migration)
+        finally:
+            await lock_conn.execute(
+                text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATIONS_LOCK_ID}
+            )
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, conlist, root_validator, validator
 
 
 class BaseDataModel(BaseModel):
@@ -22,6 +24,14 @@ class DishModel(BaseDataModel):
     price: float
 
 
+class SubmenuTreeModel(SubmenuModel):
+    dishes: list[DishModel] = []
+
+
+class MenuTreeModel(MenuModel):
+    submenus: list[SubmenuTreeModel] = []
+
+
 class UpdateMenuModel(BaseDataModel):
     title: str | None
     description: str | None
@@ -58,3 +68,110 @@ class ResponseDishModel(BaseDataModel):
     title: str
     description: str
     price: str
+
+
+class ResponseDishQueryResultModel(ResponseDishModel):
+    menu_id: str
+    submenu_id: str
+
+
+class ParentCountsModel(BaseDataModel):
+    submenus_count: int
+    dishes_count: int
+    submenu_dishes_count: int | None
+
+
+class ResponseSubmenuTreeModel(ResponseSubmenuModel):
+    dishes: list[ResponseDishModel]
+
+
+class ResponseMenuTreeModel(ResponseMenuModel):
+    submenus: list[ResponseSubmenuTreeModel]
+
+
+class ResponseSearchResultModel(BaseDataModel):
+    type: Literal["dish", "submenu"]
+    id: str
+    title: str
+    description: str
+    price: str | None
+    menu_id: str
+    submenu_id: str | None
+    rank: float
+
+
+BATCH_MODELS = {
+    ("create", "menu"): MenuModel,
+    ("create", "submenu"): SubmenuModel,
+    ("create", "dish"): DishModel,
+    ("update", "menu"): UpdateMenuModel,
+    ("update", "submenu"): UpdateSubmenuModel,
+    ("update", "dish"): UpdateDishModel,
+}
+
+BATCH_PARENTS = {
+    "menu": (),
+    "submenu": ("menu_id",),
+    "dish": ("menu_id", "submenu_id"),
+}
+
+
+class BatchOperationModel(BaseDataModel):
+    action: Literal["create", "update", "delete"]
+    target: Literal["menu", "submenu", "dish"]
+    id: int | None
+    menu_id: int | None
+    submenu_id: int | None
+    data: dict | None
+
+    @root_validator(skip_on_failure=True)
+    def check_operation(cls, values: dict) -> dict:
+        action, target = values["action"], values["target"]
+        required = list(BATCH_PARENTS[target])
+        if action != "create":
+            required.append("id")
+        missing = [name for name in required if values.get(name) is None]
+        if missing:
+            raise ValueError(f"{action} {target} requires {', '.join(missing)}")
+        model = BATCH_MODELS.get((action, target))
+        if model is not None:
+            values["data"] = model(**(values.get("data") or {})).dict()
+        return values
+
+
+class BatchModel(BaseDataModel):
+    operations: conlist(BatchOperationModel, min_items=1, max_items=1000)
+
+    @validator("operations")
+    def check_conflicts(
+        cls, operations: list[BatchOperationModel]
+    ) -> list[BatchOperationModel]:
+        # Operations are grouped by action and target, so the result must not
+        # depend on their order in the request.
+        targets = set()
+        deleted = set()
+        for operation in operations:
+            if operation.action == "create":
+                continue
+            target = (operation.target, operation.id)
+            if target in targets:
+                raise ValueError(f"{operation.target} {operation.id} is repeated")
+            targets.add(target)
+            if operation.action == "delete":
+                deleted.add(target)
+        for operation in operations:
+            for parent in ("menu", "submenu"):
+                parent_id = getattr(operation, f"{parent}_id")
+                if (parent, parent_id) in deleted:
+                    raise ValueError(f"{parent} {parent_id} is deleted in the batch")
+        return operations
+
+
+class ResponseBatchResultModel(BaseDataModel):
+    status: int
+    item: dict | None
+    detail: str | None
+
+
+class ResponseBatchModel(BaseDataModel):
+    results: list[ResponseBatchResultModel]
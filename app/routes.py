@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, JSONResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import create_tables
+from app import bulk_import, cache, instrumentation, warmup
+from app.database import create_tables, replicas
+from app.migrations import DB_MIGRATE_ON_STARTUP
 from app.models import (
+    BatchModel,
     DishModel,
     MenuModel,
+    ResponseBatchModel,
     ResponseDishModel,
+    ResponseDishQueryResultModel,
     ResponseMenuModel,
+    ResponseMenuTreeModel,
+    ResponseSearchResultModel,
     ResponseSubmenuModel,
     SubmenuModel,
     UpdateDishModel,
@@ -14,13 +22,23 @@ from app.models import (
     UpdateSubmenuModel,
 )
 from app.services import (
+    BatchService,
     DataReportService,
+    DishFilter,
     DishService,
     MenuService,
+    Page,
+    SearchService,
     SubmenuService,
+    get_batch_service,
     get_data_report_service,
+    get_db,
+    get_dish_filter,
     get_dish_service,
     get_menu_service,
+    get_page,
+    get_required_page,
+    get_search_service,
     get_submenu_service,
 )
 from app.test_data.add_test_data import add_test_data
@@ -30,7 +48,54 @@ router = APIRouter()
 
 @router.on_event("startup")
 async def startup():
-    await create_tables()
+    if DB_MIGRATE_ON_STARTUP:
+        await create_tables()
+    await replicas.start()
+    await cache.start_invalidation_listener()
+    if cache.MEMBERSHIP_FILTER_ENABLED:
+        await warmup.rebuild_membership_filters()
+    if warmup.WARMUP_ENABLED:
+        await warmup.warm_up()
+    warmup.ready.set()
+
+
+@router.on_event("shutdown")
+async def shutdown():
+    await cache.stop_invalidation_listener()
+    await replicas.stop()
+
+
+@router.get(
+    path="/health/ready",
+    tags=["Health"],
+    summary="Readiness check",
+    description="Report whether the worker has finished startup and cache warm-up",
+    response_description="Worker readiness",
+    status_code=status.HTTP_200_OK,
+    response_model=dict,
+)
+async def readiness_handler() -> JSONResponse:
+    if warmup.ready.is_set():
+        return JSONResponse(content={"status": "ready"})
+    return JSONResponse(
+        content={"status": "starting"},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+@router.get(
+    path="/health/queries",
+    tags=["Health"],
+    summary="Query statistics",
+    description="Show sampled per-fingerprint SQL statistics, slowest in total first",
+    response_description="Query statistics",
+    status_code=status.HTTP_200_OK,
+    response_model=list[dict],
+)
+async def query_stats_handler(limit: int = 20) -> list[dict]:
+    if not instrumentation.DB_QUERY_STATS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return instrumentation.get_query_stats(limit=limit)
 
 
 @router.post(
@@ -96,9 +161,41 @@ async def create_dish_handler(
     response_model=list[ResponseMenuModel],
 )
 async def get_menus_list_handler(
+    page: Page | None = Depends(get_page),
+    menu_service: MenuService = Depends(get_menu_service),
+) -> list[ResponseMenuModel] | Response:
+    return await menu_service.get_list(page=page)
+
+
+@router.get(
+    path="/menus/tree",
+    tags=["Menu"],
+    summary="Get menus tree",
+    description="Get all menus with their submenus and dishes in one document",
+    response_description="Menus tree",
+    status_code=status.HTTP_200_OK,
+    response_model=list[ResponseMenuTreeModel],
+)
+async def get_menus_tree_handler(
+    menu_service: MenuService = Depends(get_menu_service),
+) -> Response:
+    return await menu_service.get_tree()
+
+
+@router.get(
+    path="/menus/{menu_id}/tree",
+    tags=["Menu"],
+    summary="Get menu tree",
+    description="Get requested menu with its submenus and dishes in one document",
+    response_description="Requested menu tree",
+    status_code=status.HTTP_200_OK,
+    response_model=ResponseMenuTreeModel,
+)
+async def get_menu_tree_handler(
+    menu_id: int,
     menu_service: MenuService = Depends(get_menu_service),
-) -> list[ResponseMenuModel]:
-    return await menu_service.get_list()
+) -> Response:
+    return await menu_service.get_menu_tree(menu_id=menu_id)
 
 
 @router.get(
@@ -113,7 +210,7 @@ async def get_menus_list_handler(
 async def get_menu_handler(
     menu_id: int,
     menu_service: MenuService = Depends(get_menu_service),
-) -> ResponseMenuModel:
+) -> ResponseMenuModel | Response:
     return await menu_service.get_menu(menu_id=menu_id)
 
 
@@ -128,9 +225,10 @@ async def get_menu_handler(
 )
 async def get_submenus_list_handler(
     menu_id: int,
+    page: Page | None = Depends(get_page),
     submenu_service: SubmenuService = Depends(get_submenu_service),
-) -> list[ResponseSubmenuModel]:
-    return await submenu_service.get_list(menu_id)
+) -> list[ResponseSubmenuModel] | Response:
+    return await submenu_service.get_list(menu_id, page=page)
 
 
 @router.get(
@@ -146,7 +244,7 @@ async def get_submenu_handler(
     menu_id: int,
     submenu_id: int,
     submenu_service: SubmenuService = Depends(get_submenu_service),
-) -> ResponseSubmenuModel:
+) -> ResponseSubmenuModel | Response:
     return await submenu_service.get_submenu(menu_id=menu_id, submenu_id=submenu_id)
 
 
@@ -154,7 +252,7 @@ async def get_submenu_handler(
     path="/menus/{menu_id}/submenus/{submenu_id}/dishes",
     tags=["Dish"],
     summary="Get dishes list",
-    description="Get dishes list with title, description and price",
+    description="Get dishes list, optionally filtered by price and sorted by price or title",
     response_description="Dishes list",
     status_code=status.HTTP_200_OK,
     response_model=list[ResponseDishModel],
@@ -162,9 +260,30 @@ async def get_submenu_handler(
 async def get_dishes_list_handler(
     menu_id: int,
     submenu_id: int,
+    page: Page | None = Depends(get_page),
+    dish_filter: DishFilter = Depends(get_dish_filter),
+    dish_service: DishService = Depends(get_dish_service),
+) -> list[ResponseDishModel] | Response:
+    return await dish_service.get_list(
+        menu_id, submenu_id, page=page, dish_filter=dish_filter
+    )
+
+
+@router.get(
+    path="/dishes",
+    tags=["Dish"],
+    summary="Query dishes",
+    description="Get dishes of all menus with their menu and submenu, filtered by price",
+    response_description="Dishes list",
+    status_code=status.HTTP_200_OK,
+    response_model=list[ResponseDishQueryResultModel],
+)
+async def query_dishes_handler(
+    page: Page = Depends(get_required_page),
+    dish_filter: DishFilter = Depends(get_dish_filter),
     dish_service: DishService = Depends(get_dish_service),
-) -> list[ResponseDishModel]:
-    return await dish_service.get_list(menu_id, submenu_id)
+) -> Response:
+    return await dish_service.query_dishes(dish_filter=dish_filter, page=page)
 
 
 @router.get(
@@ -181,7 +300,7 @@ async def get_dish_handler(
     submenu_id: int,
     dish_id: int,
     dish_service: DishService = Depends(get_dish_service),
-) -> ResponseDishModel:
+) -> ResponseDishModel | Response:
     return await dish_service.get_dish(
         menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
     )
@@ -301,6 +420,39 @@ async def delete_dish_handler(
     )
 
 
+@router.get(
+    path="/search",
+    tags=["Search"],
+    summary="Search dishes and submenus",
+    description="Search dish and submenu titles and descriptions by word prefixes",
+    response_description="Matching dishes and submenus",
+    status_code=status.HTTP_200_OK,
+    response_model=list[ResponseSearchResultModel],
+)
+async def search_handler(
+    q: str = Query(min_length=1, max_length=100),
+    page: Page = Depends(get_required_page),
+    search_service: SearchService = Depends(get_search_service),
+) -> Response:
+    return await search_service.search(text=q, page=page)
+
+
+@router.post(
+    path="/batch",
+    tags=["Batch"],
+    summary="Run batch",
+    description="Create, update and delete menus, submenus and dishes in one transaction",
+    response_description="Result of every operation in request order",
+    status_code=status.HTTP_200_OK,
+    response_model=ResponseBatchModel,
+)
+async def run_batch_handler(
+    batch: BatchModel,
+    batch_service: BatchService = Depends(get_batch_service),
+) -> ResponseBatchModel:
+    return await batch_service.run_batch(batch=batch)
+
+
 @router.post(
     path="/data_report/add_test_data",
     tags=["Data report"],
@@ -311,15 +463,26 @@ async def delete_dish_handler(
     response_model=str,
 )
 async def add_test_data_handler(
-    menu_service: MenuService = Depends(get_menu_service),
-    submenu_service: SubmenuService = Depends(get_submenu_service),
-    dishes_service: DishService = Depends(get_dish_service),
+    db: AsyncSession = Depends(get_db),
 ) -> str:
-    return await add_test_data(
-        menu_service=menu_service,
-        submenu_service=submenu_service,
-        dishes_service=dishes_service,
-    )
+    return await add_test_data(db=db)
+
+
+@router.post(
+    path="/import",
+    tags=["Import"],
+    summary="Import menu trees",
+    description="Bulk import menus with nested submenus and dishes, "
+    "streamed as newline-delimited JSON with one menu per line",
+    response_description="Number of imported menus, submenus and dishes",
+    status_code=status.HTTP_201_CREATED,
+    response_model=dict[str, int],
+)
+async def import_handler(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+) -> dict[str, int]:
+    return await bulk_import.import_ndjson(db=db, chunks=request.stream())
 
 
 @router.post(
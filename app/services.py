@@ -1,16 +1,33 @@
+import asyncio
+import binascii
+import math
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Awaitable, Callable
 from dataclasses import dataclass
+from decimal import Decimal
+from json import loads
+from typing import Literal
 
 from celery.result import AsyncResult
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import URL
 
 from app import cache, crud
+from app.cache_codecs import serialize
 from app.celery_worker.tasks import data_report_task
+from app.database import DB_REPLICA_MAX_LAG, SessionLocal
 from app.models import (
+    BatchModel,
+    BatchOperationModel,
     DishModel,
     MenuModel,
+    ParentCountsModel,
+    ResponseBatchModel,
+    ResponseBatchResultModel,
     ResponseDishModel,
     ResponseMenuModel,
     ResponseSubmenuModel,
@@ -20,6 +37,312 @@ from app.models import (
     UpdateSubmenuModel,
 )
 
+MENUS_GENERATION = "menus_generation"
+MENUS_PAGES_GENERATION = "menus_pages_generation"
+MENUS_TREE_GENERATION = "menus_tree_generation"
+DISHES_GENERATION = "dishes_generation"
+SEARCH_GENERATION = "search_generation"
+
+MENU_IDS = "menu_ids"
+SUBMENU_IDS = "submenu_ids"
+DISH_IDS = "dish_ids"
+
+CacheKey = tuple[str, list[str]]
+
+CACHE_TTL = {
+    "menu": cache.CacheTTL(fresh=300, grace=300, jitter=0.1),
+    "submenu": cache.CacheTTL(fresh=300, grace=300, jitter=0.1),
+    "dish": cache.CacheTTL(fresh=600, grace=600, jitter=0.1),
+    "search": cache.CacheTTL(fresh=60, grace=60, jitter=0.1),
+}
+# Replicas may lag behind writes that already patched the cache, what they load
+# only lives until the lag has passed.
+REPLICA_CACHE_TTL = cache.CacheTTL(
+    fresh=max(math.ceil(DB_REPLICA_MAX_LAG), 1), grace=0, jitter=0
+)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+SEARCH_TERM = re.compile(r"[^\W_]+")
+
+_refresh_tasks: set[asyncio.Task] = set()
+
+
+def invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid cursor",
+    )
+
+
+@dataclass(frozen=True)
+class Page:
+    cursor: str | None
+    limit: int
+    url: URL
+
+    @property
+    def after_id(self) -> int | None:
+        if self.cursor is None:
+            return None
+        try:
+            return int(self.cursor)
+        except ValueError:
+            raise invalid_cursor()
+
+
+def encode_cursor(value: int | str) -> str:
+    return urlsafe_b64encode(str(value).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise invalid_cursor()
+
+
+def get_page(
+    request: Request,
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+) -> Page | None:
+    if limit is None and cursor is None:
+        return None
+    return Page(
+        cursor=decode_cursor(cursor) if cursor else None,
+        limit=limit or DEFAULT_PAGE_SIZE,
+        url=request.url,
+    )
+
+
+def get_required_page(
+    request: Request,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+) -> Page:
+    return Page(
+        cursor=decode_cursor(cursor) if cursor else None, limit=limit, url=request.url
+    )
+
+
+@dataclass(frozen=True)
+class DishFilter:
+    sort: str = "id"
+    min_price: Decimal | None = None
+    max_price: Decimal | None = None
+
+    @property
+    def is_default(self) -> bool:
+        return self == DishFilter()
+
+    def after(self, page: Page | None) -> tuple | None:
+        if page is None or page.cursor is None:
+            return None
+        if self.sort == "id":
+            return (page.after_id,)
+        # Sorted cursors carry the sort value, the row it came from may be gone.
+        value, separator, item_id = page.cursor.rpartition(":")
+        try:
+            if self.sort == "price":
+                value = Decimal(value)
+                if not value.is_finite():
+                    raise ValueError(value)
+            if not separator:
+                raise ValueError(page.cursor)
+            return value, int(item_id)
+        except (ArithmeticError, ValueError):
+            raise invalid_cursor()
+
+    def next_cursor(self, items: list[dict]) -> str:
+        if self.sort == "id":
+            return encode_cursor(items[-1]["id"])
+        return encode_cursor(f"{items[-1][self.sort]}:{items[-1]['id']}")
+
+
+def get_dish_filter(
+    sort: Literal["id", "price", "title"] = "id",
+    min_price: Decimal | None = Query(default=None, ge=0),
+    max_price: Decimal | None = Query(default=None, ge=0),
+) -> DishFilter:
+    return DishFilter(sort=sort, min_price=min_price, max_price=max_price)
+
+
+def prefix_query(text: str) -> str:
+    terms = SEARCH_TERM.findall(text.lower())
+    if not terms:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid search query",
+        )
+    # Every word has to match, the last ones may still be typed so all are prefixes.
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def menu_generation(menu_id: int) -> str:
+    return f"menu_generation_{menu_id}"
+
+
+def submenu_generation(submenu_id: int) -> str:
+    return f"submenu_generation_{submenu_id}"
+
+
+def menu_tree_generation(menu_id: int) -> str:
+    return f"menu_tree_generation_{menu_id}"
+
+
+def write_generations(menu_id: int) -> list[str]:
+    # Any write below a menu changes the trees and may change search and dish queries.
+    return [
+        MENUS_TREE_GENERATION,
+        menu_tree_generation(menu_id),
+        SEARCH_GENERATION,
+        DISHES_GENERATION,
+    ]
+
+
+def submenus_pages_generation(menu_id: int) -> str:
+    return f"submenus_pages_generation_{menu_id}"
+
+
+def dishes_pages_generation(submenu_id: int) -> str:
+    return f"dishes_pages_generation_{submenu_id}"
+
+
+def menus_list_key() -> CacheKey:
+    return "menus_list", [MENUS_GENERATION]
+
+
+def menu_key(menu_id: int) -> CacheKey:
+    return f"menu_{menu_id}", [menu_generation(menu_id)]
+
+
+def menus_tree_key() -> CacheKey:
+    return "menus_tree", [MENUS_TREE_GENERATION]
+
+
+def menu_tree_key(menu_id: int) -> CacheKey:
+    return f"menu_tree_{menu_id}", [menu_tree_generation(menu_id)]
+
+
+def search_key(query: str, page: Page) -> CacheKey:
+    return f"search_{page_suffix(page)}_{query}", [SEARCH_GENERATION]
+
+
+def submenus_list_key(menu_id: int) -> CacheKey:
+    return f"submenus_list_{menu_id}", [menu_generation(menu_id)]
+
+
+def page_suffix(page: Page) -> str:
+    return f"{page.after_id or 0}_{page.limit}"
+
+
+def menus_page_key(page: Page) -> CacheKey:
+    return f"menus_page_{page_suffix(page)}", [
+        MENUS_GENERATION,
+        MENUS_PAGES_GENERATION,
+    ]
+
+
+def submenus_page_key(menu_id: int, page: Page) -> CacheKey:
+    return f"submenus_page_{menu_id}_{page_suffix(page)}", [
+        menu_generation(menu_id),
+        submenus_pages_generation(menu_id),
+    ]
+
+
+def submenu_key(menu_id: int, submenu_id: int) -> CacheKey:
+    return f"submenu_{menu_id}_{submenu_id}", [
+        menu_generation(menu_id),
+        submenu_generation(submenu_id),
+    ]
+
+
+def dishes_list_key(menu_id: int, submenu_id: int) -> CacheKey:
+    return f"dishes_list_{menu_id}_{submenu_id}", [
+        menu_generation(menu_id),
+        submenu_generation(submenu_id),
+    ]
+
+
+def dishes_page_key(menu_id: int, submenu_id: int, page: Page) -> CacheKey:
+    return f"dishes_page_{menu_id}_{submenu_id}_{page_suffix(page)}", [
+        menu_generation(menu_id),
+        submenu_generation(submenu_id),
+        dishes_pages_generation(submenu_id),
+    ]
+
+
+def dish_filter_suffix(dish_filter: DishFilter, page: Page | None) -> str:
+    suffix = f"{dish_filter.sort}_{dish_filter.min_price}_{dish_filter.max_price}"
+    if page is None:
+        return suffix
+    after = ":".join(map(str, dish_filter.after(page) or (0,)))
+    return f"{suffix}_{after}_{page.limit}"
+
+
+def dishes_filter_key(
+    menu_id: int, submenu_id: int, dish_filter: DishFilter, page: Page | None
+) -> CacheKey:
+    # Filtered views can't be patched, dish writes bump the pages generation instead.
+    return (
+        f"dishes_filter_{menu_id}_{submenu_id}_{dish_filter_suffix(dish_filter, page)}",
+        [
+            menu_generation(menu_id),
+            submenu_generation(submenu_id),
+            dishes_pages_generation(submenu_id),
+        ],
+    )
+
+
+def dishes_query_key(dish_filter: DishFilter, page: Page) -> CacheKey:
+    return f"dishes_query_{dish_filter_suffix(dish_filter, page)}", [DISHES_GENERATION]
+
+
+def dish_key(menu_id: int, submenu_id: int, dish_id: int) -> CacheKey:
+    return f"dish_{menu_id}_{submenu_id}_{dish_id}", [
+        menu_generation(menu_id),
+        submenu_generation(submenu_id),
+    ]
+
+
+def put_item(items: list | None, item: dict) -> list | None:
+    # Replaces an item already loaded from the database, patches may meet it twice.
+    if items is None:
+        return None
+    return [*remove_item(items, item["id"]), item]
+
+
+def update_fields(item: dict | None, fields: dict) -> dict | None:
+    return None if item is None else {**item, **fields}
+
+
+def update_item(items: list | None, item_id: int | str, fields: dict) -> list | None:
+    if items is None:
+        return None
+    return [
+        update_fields(item, fields) if item["id"] == str(item_id) else item
+        for item in items
+    ]
+
+
+def remove_item(items: list | None, item_id: int | str) -> list | None:
+    if items is None:
+        return None
+    return [item for item in items if item["id"] != str(item_id)]
+
+
+def menu_counts(counts: ParentCountsModel) -> dict:
+    return {
+        "submenus_count": counts.submenus_count,
+        "dishes_count": counts.dishes_count,
+    }
+
+
+def submenu_counts(counts: ParentCountsModel) -> dict:
+    return {"dishes_count": counts.submenu_dishes_count}
+
 
 def get_db(request: Request) -> Request:
     return request.state.db
@@ -47,39 +370,240 @@ class Service:
             )
         return True
 
+    async def get_cached(
+        self,
+        name: str,
+        loader: Callable[[AsyncSession], Awaitable],
+        ttl: cache.CacheTTL,
+        membership: tuple[str, int] | None = None,
+    ):
+        if membership is not None:
+            loader = self.filter_members(loader, *membership)
+        # Entries may have been filled from a replica that hasn't seen the client's
+        # own recent write yet, those clients read the primary.
+        reads_own_writes = getattr(self.db, "reads_own_writes", False)
+        if not reads_own_writes:
+            if membership is None:
+                raw, is_stale = await cache.get_entry(name)
+            else:
+                (raw, is_stale), (not_found, _) = await cache.get_entries(
+                    [name, cache.not_found_name(name)]
+                )
+                if raw is None and not_found is not None:
+                    return None
+            if raw is not None:
+                if is_stale:
+                    self.refresh_in_background(name, loader, ttl)
+                return Response(content=raw, media_type="application/json")
+        if membership is not None:
+            not_found_version = await cache.get_write_version(
+                cache.not_found_name(name)
+            )
+        not_found_ttl = cache.NOT_FOUND_TTL
+        if getattr(self.db, "info", {}).get("replica"):
+            ttl = not_found_ttl = REPLICA_CACHE_TTL
+        if reads_own_writes:
+            value = await cache.load(name, lambda: loader(self.db), ttl)
+        else:
+            value = await cache.load_once(name, lambda: loader(self.db), ttl)
+        if value is None and membership is not None:
+            await cache.set_cache_unless_written(
+                name=cache.not_found_name(name),
+                value=True,
+                ttl=not_found_ttl,
+                version=not_found_version,
+            )
+        if isinstance(value, bytes):
+            return Response(content=value, media_type="application/json")
+        return value
+
+    async def get_cached_page(
+        self,
+        key: CacheKey,
+        loader: Callable[[AsyncSession], Awaitable],
+        ttl: cache.CacheTTL,
+        page: Page,
+        next_cursor: Callable[[list[dict]], str] | None = None,
+    ) -> Response:
+        items = await self.get_cached(await self.cache_name(key), loader, ttl)
+        if isinstance(items, Response):
+            content = items.body
+            items = loads(content)
+        else:
+            items = jsonable_encoder(items)
+            content = serialize(items)
+        headers = {}
+        # A full page may be followed by more items, a shorter one is the last.
+        if len(items) == page.limit:
+            next_url = page.url.include_query_params(
+                limit=page.limit,
+                cursor=(
+                    encode_cursor(items[-1]["id"])
+                    if next_cursor is None
+                    else next_cursor(items)
+                ),
+            )
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return Response(content=content, media_type="application/json", headers=headers)
+
+    @staticmethod
+    def filter_members(
+        loader: Callable[[AsyncSession], Awaitable], name: str, item_id: int
+    ) -> Callable[[AsyncSession], Awaitable]:
+        async def load(db: AsyncSession):
+            if not await cache.is_member(name, item_id):
+                return None
+            return await loader(db)
+
+        return load
+
+    @staticmethod
+    def refresh_in_background(
+        name: str, loader: Callable[[AsyncSession], Awaitable], ttl: cache.CacheTTL
+    ) -> None:
+        async def refresh() -> None:
+            try:
+                async with SessionLocal() as db:
+                    await cache.refresh(name, lambda: loader(db), ttl)
+            except Exception as ex:
+                print(ex)
+
+        task = asyncio.create_task(refresh())
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+
+    @staticmethod
+    async def patch_cache(
+        names: list[str],
+        patcher: Callable[[dict], dict],
+        fallback: list[str],
+        generations: list[str] | None = None,
+    ) -> None:
+        try:
+            await cache.patch_many(names, patcher, generations)
+        except Exception as ex:
+            print(ex)
+            await cache.bump_generations(names=[*(generations or []), *fallback])
+
+    @staticmethod
+    async def cache_name(key: CacheKey) -> str:
+        return (await Service.cache_names([key]))[0]
+
+    @staticmethod
+    async def cache_names(keys: list[CacheKey]) -> list[str]:
+        generations = list({name for _, names in keys for name in names})
+        values = dict(zip(generations, await cache.get_generations(generations)))
+        return [
+            ":".join([name, *(str(values[generation]) for generation in names)])
+            for name, names in keys
+        ]
+
 
 class MenuService(Service):
     @staticmethod
-    async def update_cache(menu_id: int | None = None) -> None:
-        await cache.delete_cache(
-            names=(
-                "menus_list",
-                f"menu_{menu_id}",
-            ),
+    async def cache_created(menu: ResponseMenuModel) -> None:
+        menu_id = int(menu.id)
+        menus_list, menu_name = await Service.cache_names(
+            [menus_list_key(), menu_key(menu_id)]
+        )
+        not_found = cache.not_found_name(menu_name)
+        item = {**jsonable_encoder(menu), "submenus_count": 0, "dishes_count": 0}
+        await Service.patch_cache(
+            names=[menus_list, not_found],
+            patcher=lambda values: {
+                menus_list: put_item(values[menus_list], item),
+                not_found: cache.DELETE,
+            },
+            generations=[MENUS_PAGES_GENERATION, *write_generations(menu_id)],
+            fallback=[MENUS_GENERATION, menu_generation(menu_id)],
+        )
+
+    @staticmethod
+    async def cache_updated(menu: ResponseMenuModel) -> None:
+        menu_id = int(menu.id)
+        menus_list, menu_name = await Service.cache_names(
+            [menus_list_key(), menu_key(menu_id)]
+        )
+        fields = {"title": menu.title, "description": menu.description}
+        await Service.patch_cache(
+            names=[menus_list, menu_name],
+            patcher=lambda values: {
+                menus_list: update_item(values[menus_list], menu_id, fields),
+                menu_name: update_fields(values[menu_name], fields),
+            },
+            generations=[MENUS_PAGES_GENERATION, *write_generations(menu_id)],
+            fallback=[MENUS_GENERATION, menu_generation(menu_id)],
+        )
+
+    @staticmethod
+    async def cache_deleted(menu_id: int) -> None:
+        menus_list = await Service.cache_name(menus_list_key())
+        await Service.patch_cache(
+            names=[menus_list],
+            patcher=lambda values: {
+                menus_list: remove_item(values[menus_list], menu_id),
+            },
+            generations=[
+                menu_generation(menu_id),
+                MENUS_PAGES_GENERATION,
+                *write_generations(menu_id),
+            ],
+            fallback=[MENUS_GENERATION],
         )
 
     async def create_menu(self, menu: MenuModel) -> ResponseMenuModel | None:
         new_menu = await crud.create_menu(db=self.db, menu=menu)
         if await self.is_item_created(new_menu):
-            await self.update_cache()
+            await cache.set_membership(MENU_IDS, [int(new_menu.id)], True)
+            await self.cache_created(menu=new_menu)
             return new_menu
         return None
 
-    async def get_list(self) -> list[ResponseMenuModel]:
-        menus_list = await cache.get_cache(name="menus_list")
-        if not menus_list:
-            menus_list = await crud.get_menus_list(db=self.db)
-            await cache.set_cache(name="menus_list", value=menus_list)
-        return menus_list
-
-    async def get_menu(self, menu_id: int) -> ResponseMenuModel:
-        menu = await cache.get_cache(name=f"menu_{menu_id}")
-        if not menu:
-            menu = await crud.get_menu(self.db, menu_id)
-            await self.is_item_found(menu, "menu")
-            await cache.set_cache(name=f"menu_{menu_id}", value=menu)
+    async def get_list(
+        self, page: Page | None = None
+    ) -> list[ResponseMenuModel] | Response:
+        if page is not None:
+            return await self.get_cached_page(
+                key=menus_page_key(page),
+                loader=lambda db: crud.get_menus_list(
+                    db=db, after_id=page.after_id, limit=page.limit
+                ),
+                ttl=CACHE_TTL["menu"],
+                page=page,
+            )
+        return await self.get_cached(
+            name=await self.cache_name(menus_list_key()),
+            loader=lambda db: crud.get_menus_list(db=db),
+            ttl=CACHE_TTL["menu"],
+        )
+
+    async def get_menu(self, menu_id: int) -> ResponseMenuModel | Response:
+        menu = await self.get_cached(
+            name=await self.cache_name(menu_key(menu_id)),
+            loader=lambda db: crud.get_menu(db, menu_id),
+            ttl=CACHE_TTL["menu"],
+            membership=(MENU_IDS, menu_id),
+        )
+        await self.is_item_found(menu, "menu")
         return menu
 
+    async def get_tree(self) -> Response:
+        return await self.get_cached(
+            name=await self.cache_name(menus_tree_key()),
+            loader=crud.get_menus_tree,
+            ttl=CACHE_TTL["menu"],
+        )
+
+    async def get_menu_tree(self, menu_id: int) -> Response:
+        tree = await self.get_cached(
+            name=await self.cache_name(menu_tree_key(menu_id)),
+            loader=lambda db: crud.get_menu_tree(db, menu_id),
+            ttl=CACHE_TTL["menu"],
+            membership=(MENU_IDS, menu_id),
+        )
+        await self.is_item_found(tree, "menu")
+        return tree
+
     async def update_menu(
         self, menu_update: UpdateMenuModel, menu_id: int
     ) -> ResponseMenuModel | None:
@@ -87,13 +611,14 @@ class MenuService(Service):
             db=self.db, menu_update=menu_update, menu_id=menu_id
         )
         await self.is_item_found(updated_menu, "menu")
-        await self.update_cache(menu_id=menu_id)
+        await self.cache_updated(menu=updated_menu)
         return updated_menu
 
     async def delete_menu(self, menu_id: int) -> ResponseMenuModel | None:
         menu = await crud.delete_menu(db=self.db, menu_id=menu_id)
         await self.is_item_found(menu, "menu")
-        await self.update_cache(menu_id=menu_id)
+        await cache.set_membership(MENU_IDS, [menu_id], False)
+        await self.cache_deleted(menu_id=menu_id)
         return menu
 
 
@@ -103,42 +628,131 @@ async def get_menu_service(db: AsyncSession = Depends(get_db)) -> MenuService:
 
 class SubmenuService(Service):
     @staticmethod
-    async def update_cache(menu_id: int, submenu_id: int | None = None) -> None:
-        names = [
-            "menus_list",
-            f"menu_{menu_id}",
-            f"submenus_list_{menu_id}",
-        ]
-        if submenu_id:
-            names.append(f"submenu_{menu_id}_{submenu_id}")
-        await cache.delete_cache(names=names)
+    async def cache_created(
+        menu_id: int, submenu: ResponseSubmenuModel, counts: ParentCountsModel
+    ) -> None:
+        submenu_id = int(submenu.id)
+        menus_list, menu_name, submenus_list, submenu_name = await Service.cache_names(
+            [
+                menus_list_key(),
+                menu_key(menu_id),
+                submenus_list_key(menu_id),
+                submenu_key(menu_id, submenu_id),
+            ]
+        )
+        not_found = cache.not_found_name(submenu_name)
+        item = {**jsonable_encoder(submenu), "dishes_count": 0}
+        fields = menu_counts(counts)
+        await Service.patch_cache(
+            names=[menus_list, menu_name, submenus_list, not_found],
+            patcher=lambda values: {
+                menus_list: update_item(values[menus_list], menu_id, fields),
+                menu_name: update_fields(values[menu_name], fields),
+                submenus_list: put_item(values[submenus_list], item),
+                not_found: cache.DELETE,
+            },
+            generations=[
+                MENUS_PAGES_GENERATION,
+                submenus_pages_generation(menu_id),
+                *write_generations(menu_id),
+            ],
+            fallback=[MENUS_GENERATION, menu_generation(menu_id)],
+        )
+
+    @staticmethod
+    async def cache_updated(menu_id: int, submenu: ResponseSubmenuModel) -> None:
+        submenu_id = int(submenu.id)
+        submenus_list, submenu_name = await Service.cache_names(
+            [submenus_list_key(menu_id), submenu_key(menu_id, submenu_id)]
+        )
+        fields = {"title": submenu.title, "description": submenu.description}
+        await Service.patch_cache(
+            names=[submenus_list, submenu_name],
+            patcher=lambda values: {
+                submenus_list: update_item(values[submenus_list], submenu_id, fields),
+                submenu_name: update_fields(values[submenu_name], fields),
+            },
+            generations=[
+                submenus_pages_generation(menu_id),
+                *write_generations(menu_id),
+            ],
+            fallback=[menu_generation(menu_id)],
+        )
+
+    @staticmethod
+    async def cache_deleted(
+        menu_id: int, submenu_id: int, counts: ParentCountsModel
+    ) -> None:
+        menus_list, menu_name, submenus_list, submenu_name = await Service.cache_names(
+            [
+                menus_list_key(),
+                menu_key(menu_id),
+                submenus_list_key(menu_id),
+                submenu_key(menu_id, submenu_id),
+            ]
+        )
+        fields = menu_counts(counts)
+        await Service.patch_cache(
+            names=[menus_list, menu_name, submenus_list, submenu_name],
+            patcher=lambda values: {
+                menus_list: update_item(values[menus_list], menu_id, fields),
+                menu_name: update_fields(values[menu_name], fields),
+                submenus_list: remove_item(values[submenus_list], submenu_id),
+            },
+            generations=[
+                submenu_generation(submenu_id),
+                MENUS_PAGES_GENERATION,
+                submenus_pages_generation(menu_id),
+                *write_generations(menu_id),
+            ],
+            fallback=[MENUS_GENERATION, menu_generation(menu_id)],
+        )
 
     async def create_submenu(
         self, menu_id: int, submenu: SubmenuModel
     ) -> ResponseSubmenuModel | None:
-        new_submenu = await crud.create_submenu(
+        created = await crud.create_submenu(
             db=self.db, menu_id=menu_id, submenu=submenu
         )
-        if await self.is_item_created(new_submenu):
-            await self.update_cache(menu_id=menu_id)
+        if await self.is_item_created(created):
+            new_submenu, counts = created
+            await cache.set_membership(SUBMENU_IDS, [int(new_submenu.id)], True)
+            await self.cache_created(
+                menu_id=menu_id, submenu=new_submenu, counts=counts
+            )
             return new_submenu
         return None
 
-    async def get_list(self, menu_id: int) -> list[ResponseSubmenuModel]:
-        submenus_list = await cache.get_cache(name=f"submenus_list_{menu_id}")
-        if not submenus_list:
-            submenus_list = await crud.get_submenus_list(db=self.db, menu_id=menu_id)
-            await cache.set_cache(name=f"submenus_list_{menu_id}", value=submenus_list)
-        return submenus_list
-
-    async def get_submenu(self, menu_id: int, submenu_id: int) -> ResponseSubmenuModel:
-        submenu = await cache.get_cache(name=f"submenu_{menu_id}_{submenu_id}")
-        if not submenu:
-            submenu = await crud.get_submenu(
-                db=self.db, menu_id=menu_id, submenu_id=submenu_id
+    async def get_list(
+        self, menu_id: int, page: Page | None = None
+    ) -> list[ResponseSubmenuModel] | Response:
+        if page is not None:
+            return await self.get_cached_page(
+                key=submenus_page_key(menu_id, page),
+                loader=lambda db: crud.get_submenus_list(
+                    db=db, menu_id=menu_id, after_id=page.after_id, limit=page.limit
+                ),
+                ttl=CACHE_TTL["submenu"],
+                page=page,
             )
-            await self.is_item_found(submenu, "submenu")
-            await cache.set_cache(name=f"submenu_{menu_id}_{submenu_id}", value=submenu)
+        return await self.get_cached(
+            name=await self.cache_name(submenus_list_key(menu_id)),
+            loader=lambda db: crud.get_submenus_list(db=db, menu_id=menu_id),
+            ttl=CACHE_TTL["submenu"],
+        )
+
+    async def get_submenu(
+        self, menu_id: int, submenu_id: int
+    ) -> ResponseSubmenuModel | Response:
+        submenu = await self.get_cached(
+            name=await self.cache_name(submenu_key(menu_id, submenu_id)),
+            loader=lambda db: crud.get_submenu(
+                db=db, menu_id=menu_id, submenu_id=submenu_id
+            ),
+            ttl=CACHE_TTL["submenu"],
+            membership=(SUBMENU_IDS, submenu_id),
+        )
+        await self.is_item_found(submenu, "submenu")
         return submenu
 
     async def update_submenu(
@@ -154,17 +768,19 @@ class SubmenuService(Service):
             submenu_id=submenu_id,
         )
         await self.is_item_found(updated_submenu, "submenu")
-        await self.update_cache(menu_id=menu_id, submenu_id=submenu_id)
+        await self.cache_updated(menu_id=menu_id, submenu=updated_submenu)
         return updated_submenu
 
     async def delete_submenu(
         self, menu_id: int, submenu_id: int
     ) -> ResponseSubmenuModel | None:
-        submenu = await crud.delete_submenu(
+        deleted = await crud.delete_submenu(
             db=self.db, menu_id=menu_id, submenu_id=submenu_id
         )
-        await self.is_item_found(submenu, "submenu")
-        await self.update_cache(menu_id=menu_id, submenu_id=submenu_id)
+        await self.is_item_found(deleted, "submenu")
+        submenu, counts = deleted
+        await cache.set_membership(SUBMENU_IDS, [submenu_id], False)
+        await self.cache_deleted(menu_id=menu_id, submenu_id=submenu_id, counts=counts)
         return submenu
 
 
@@ -174,54 +790,220 @@ async def get_submenu_service(db: AsyncSession = Depends(get_db)) -> SubmenuServ
 
 class DishService(Service):
     @staticmethod
-    async def update_cache(
-        menu_id: int, submenu_id: int, dish_id: int | None = None
+    async def cache_counters_changed(
+        menu_id: int,
+        submenu_id: int,
+        dish_id: int,
+        counts: ParentCountsModel,
+        patch_dishes: Callable[[dict, str, str], dict],
     ) -> None:
-        names = [
-            "menus_list",
-            f"menu_{menu_id}",
-            f"submenus_list_{menu_id}",
-            f"submenu_{menu_id}_{submenu_id}",
-            f"dishes_list_{menu_id}_{submenu_id}",
-        ]
-        if dish_id:
-            names.append(f"dish_{menu_id}_{submenu_id}_{dish_id}")
-        await cache.delete_cache(names=names)
+        names = await Service.cache_names(
+            [
+                menus_list_key(),
+                menu_key(menu_id),
+                submenus_list_key(menu_id),
+                submenu_key(menu_id, submenu_id),
+                dishes_list_key(menu_id, submenu_id),
+                dish_key(menu_id, submenu_id, dish_id),
+            ]
+        )
+        (
+            menus_list,
+            menu_name,
+            submenus_list,
+            submenu_name,
+            dishes_list,
+            dish_name,
+        ) = names
+        menu_fields = menu_counts(counts)
+        submenu_fields = submenu_counts(counts)
+        await Service.patch_cache(
+            names=[*names, cache.not_found_name(dish_name)],
+            patcher=lambda values: {
+                menus_list: update_item(values[menus_list], menu_id, menu_fields),
+                menu_name: update_fields(values[menu_name], menu_fields),
+                submenus_list: update_item(
+                    values[submenus_list], submenu_id, submenu_fields
+                ),
+                submenu_name: update_fields(values[submenu_name], submenu_fields),
+                **patch_dishes(values, dishes_list, dish_name),
+            },
+            generations=[
+                MENUS_PAGES_GENERATION,
+                submenus_pages_generation(menu_id),
+                dishes_pages_generation(submenu_id),
+                *write_generations(menu_id),
+            ],
+            fallback=[MENUS_GENERATION, menu_generation(menu_id)],
+        )
+
+    @staticmethod
+    async def cache_created(
+        menu_id: int,
+        submenu_id: int,
+        dish: ResponseDishModel,
+        counts: ParentCountsModel,
+    ) -> None:
+        item = jsonable_encoder(dish)
+        await DishService.cache_counters_changed(
+            menu_id=menu_id,
+            submenu_id=submenu_id,
+            dish_id=int(dish.id),
+            counts=counts,
+            patch_dishes=lambda values, dishes_list, dish_name: {
+                dishes_list: put_item(values[dishes_list], item),
+                cache.not_found_name(dish_name): cache.DELETE,
+            },
+        )
+
+    @staticmethod
+    async def cache_updated(
+        menu_id: int, submenu_id: int, dish: ResponseDishModel
+    ) -> None:
+        dish_id = int(dish.id)
+        dishes_list, dish_name = await Service.cache_names(
+            [
+                dishes_list_key(menu_id, submenu_id),
+                dish_key(menu_id, submenu_id, dish_id),
+            ]
+        )
+        fields = jsonable_encoder(dish)
+        await Service.patch_cache(
+            names=[dishes_list, dish_name],
+            patcher=lambda values: {
+                dishes_list: update_item(values[dishes_list], dish_id, fields),
+                dish_name: update_fields(values[dish_name], fields),
+            },
+            generations=[
+                dishes_pages_generation(submenu_id),
+                *write_generations(menu_id),
+            ],
+            fallback=[submenu_generation(submenu_id)],
+        )
+
+    @staticmethod
+    async def cache_deleted(
+        menu_id: int, submenu_id: int, dish_id: int, counts: ParentCountsModel
+    ) -> None:
+        await DishService.cache_counters_changed(
+            menu_id=menu_id,
+            submenu_id=submenu_id,
+            dish_id=dish_id,
+            counts=counts,
+            patch_dishes=lambda values, dishes_list, dish_name: {
+                dishes_list: remove_item(values[dishes_list], dish_id),
+                dish_name: cache.DELETE,
+            },
+        )
 
     async def create_dish(
         self, menu_id: int, submenu_id: int, dish: DishModel
     ) -> ResponseDishModel | None:
-        new_dish = await crud.create_dish(
+        created = await crud.create_dish(
             db=self.db, menu_id=menu_id, submenu_id=submenu_id, dish=dish
         )
-        if await self.is_item_created(new_dish):
-            await self.update_cache(menu_id=menu_id, submenu_id=submenu_id)
+        if await self.is_item_created(created):
+            new_dish, counts = created
+            await cache.set_membership(DISH_IDS, [int(new_dish.id)], True)
+            await self.cache_created(
+                menu_id=menu_id, submenu_id=submenu_id, dish=new_dish, counts=counts
+            )
             return new_dish
         return None
 
-    async def get_list(self, menu_id: int, submenu_id: int) -> list[ResponseDishModel]:
-        dishes_list = await cache.get_cache(name=f"dishes_list_{menu_id}_{submenu_id}")
-        if not dishes_list:
-            dishes_list = await crud.get_dishes_list(
-                db=self.db, menu_id=menu_id, submenu_id=submenu_id
+    async def get_list(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        page: Page | None = None,
+        dish_filter: DishFilter | None = None,
+    ) -> list[ResponseDishModel] | Response:
+        if dish_filter is not None and not dish_filter.is_default:
+            return await self.get_filtered_list(
+                menu_id, submenu_id, page=page, dish_filter=dish_filter
             )
-            await cache.set_cache(
-                name=f"dishes_list_{menu_id}_{submenu_id}", value=dishes_list
+        if page is not None:
+            return await self.get_cached_page(
+                key=dishes_page_key(menu_id, submenu_id, page),
+                loader=lambda db: crud.get_dishes_list(
+                    db=db,
+                    menu_id=menu_id,
+                    submenu_id=submenu_id,
+                    after_id=page.after_id,
+                    limit=page.limit,
+                ),
+                ttl=CACHE_TTL["dish"],
+                page=page,
             )
-        return dishes_list
+        return await self.get_cached(
+            name=await self.cache_name(dishes_list_key(menu_id, submenu_id)),
+            loader=lambda db: crud.get_dishes_list(
+                db=db, menu_id=menu_id, submenu_id=submenu_id
+            ),
+            ttl=CACHE_TTL["dish"],
+        )
 
-    async def get_dish(
-        self, menu_id: int, submenu_id: int, dish_id: int
-    ) -> ResponseDishModel:
-        dish = await cache.get_cache(name=f"dish_{menu_id}_{submenu_id}_{dish_id}")
-        if not dish:
-            dish = await crud.get_dish(
-                db=self.db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+    async def get_filtered_list(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        page: Page | None,
+        dish_filter: DishFilter,
+    ) -> list[ResponseDishModel] | Response:
+        key = dishes_filter_key(menu_id, submenu_id, dish_filter, page)
+
+        def loader(db: AsyncSession) -> Awaitable:
+            return crud.get_filtered_dishes_list(
+                db=db,
+                menu_id=menu_id,
+                submenu_id=submenu_id,
+                sort=dish_filter.sort,
+                min_price=dish_filter.min_price,
+                max_price=dish_filter.max_price,
+                after=dish_filter.after(page),
+                limit=page.limit if page else None,
             )
-            await self.is_item_found(dish, "dish")
-            await cache.set_cache(
-                name=f"dish_{menu_id}_{submenu_id}_{dish_id}", value=dish
+
+        if page is not None:
+            return await self.get_cached_page(
+                key=key,
+                loader=loader,
+                ttl=CACHE_TTL["dish"],
+                page=page,
+                next_cursor=dish_filter.next_cursor,
             )
+        return await self.get_cached(
+            name=await self.cache_name(key), loader=loader, ttl=CACHE_TTL["dish"]
+        )
+
+    async def query_dishes(self, dish_filter: DishFilter, page: Page) -> Response:
+        return await self.get_cached_page(
+            key=dishes_query_key(dish_filter, page),
+            loader=lambda db: crud.query_dishes(
+                db=db,
+                sort=dish_filter.sort,
+                min_price=dish_filter.min_price,
+                max_price=dish_filter.max_price,
+                after=dish_filter.after(page),
+                limit=page.limit,
+            ),
+            ttl=CACHE_TTL["dish"],
+            page=page,
+            next_cursor=dish_filter.next_cursor,
+        )
+
+    async def get_dish(
+        self, menu_id: int, submenu_id: int, dish_id: int
+    ) -> ResponseDishModel | Response:
+        dish = await self.get_cached(
+            name=await self.cache_name(dish_key(menu_id, submenu_id, dish_id)),
+            loader=lambda db: crud.get_dish(
+                db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+            ),
+            ttl=CACHE_TTL["dish"],
+            membership=(DISH_IDS, dish_id),
+        )
+        await self.is_item_found(dish, "dish")
         return dish
 
     async def update_dish(
@@ -239,17 +1021,23 @@ class DishService(Service):
             dish_id=dish_id,
         )
         await self.is_item_found(updated_dish, "dish")
-        await self.update_cache(menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
+        await self.cache_updated(
+            menu_id=menu_id, submenu_id=submenu_id, dish=updated_dish
+        )
         return updated_dish
 
     async def delete_dish(
         self, menu_id: int, submenu_id: int, dish_id: int
     ) -> ResponseDishModel | None:
-        dish = await crud.delete_dish(
+        deleted = await crud.delete_dish(
             db=self.db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
         )
-        await self.is_item_found(dish, "dish")
-        await self.update_cache(menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
+        await self.is_item_found(deleted, "dish")
+        dish, counts = deleted
+        await cache.set_membership(DISH_IDS, [dish_id], False)
+        await self.cache_deleted(
+            menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id, counts=counts
+        )
         return dish
 
 
@@ -257,6 +1045,110 @@ async def get_dish_service(db: AsyncSession = Depends(get_db)) -> DishService:
     return DishService(db=db)
 
 
+class SearchService(Service):
+    async def search(self, text: str, page: Page) -> Response:
+        query = prefix_query(text)
+        # Ranked results are not ordered by id, their cursor holds an offset instead.
+        offset = page.after_id or 0
+        return await self.get_cached_page(
+            key=search_key(query, page),
+            loader=lambda db: crud.search(
+                db=db, query=query, offset=offset, limit=page.limit
+            ),
+            ttl=CACHE_TTL["search"],
+            page=page,
+            next_cursor=lambda items: encode_cursor(offset + page.limit),
+        )
+
+
+async def get_search_service(db: AsyncSession = Depends(get_db)) -> SearchService:
+    return SearchService(db=db)
+
+
+BATCH_MEMBERSHIP = {"menu": MENU_IDS, "submenu": SUBMENU_IDS, "dish": DISH_IDS}
+
+
+@dataclass
+class BatchService:
+    db: AsyncSession
+
+    @staticmethod
+    def changed_generations(operation: BatchOperationModel, item_id: int) -> list[str]:
+        counts_changed = operation.action != "update"
+        if operation.target == "menu":
+            return [
+                MENUS_GENERATION,
+                MENUS_PAGES_GENERATION,
+                menu_generation(item_id),
+                *write_generations(item_id),
+            ]
+        if operation.target == "submenu":
+            generations = [
+                menu_generation(operation.menu_id),
+                submenus_pages_generation(operation.menu_id),
+            ]
+            if operation.action == "delete":
+                generations.append(submenu_generation(item_id))
+        else:
+            generations = [
+                submenu_generation(operation.submenu_id),
+                dishes_pages_generation(operation.submenu_id),
+            ]
+            if counts_changed:
+                generations += [
+                    menu_generation(operation.menu_id),
+                    submenus_pages_generation(operation.menu_id),
+                ]
+        if counts_changed:
+            generations += [MENUS_GENERATION, MENUS_PAGES_GENERATION]
+        return generations + write_generations(operation.menu_id)
+
+    @staticmethod
+    def result(operation: BatchOperationModel, item) -> ResponseBatchResultModel:
+        if item is None:
+            name = operation.target
+            if operation.action == "create":
+                name = "submenu" if operation.target == "dish" else "menu"
+            return ResponseBatchResultModel(
+                status=status.HTTP_404_NOT_FOUND, detail=f"{name} not found"
+            )
+        return ResponseBatchResultModel(
+            status=status.HTTP_201_CREATED
+            if operation.action == "create"
+            else status.HTTP_200_OK,
+            item=jsonable_encoder(item),
+        )
+
+    async def run_batch(self, batch: BatchModel) -> ResponseBatchModel:
+        items = await crud.run_batch(db=self.db, operations=batch.operations)
+        generations = set()
+        membership = {}
+        for operation, item in zip(batch.operations, items):
+            if item is None:
+                continue
+            generations.update(self.changed_generations(operation, int(item.id)))
+            if operation.action != "update":
+                membership.setdefault(
+                    (BATCH_MEMBERSHIP[operation.target], operation.action == "create"),
+                    [],
+                ).append(int(item.id))
+        # One invalidation for the whole batch instead of one per item.
+        if generations:
+            await cache.bump_generations(names=sorted(generations))
+        for (name, is_member), item_ids in membership.items():
+            await cache.set_membership(name, item_ids, is_member)
+        return ResponseBatchModel(
+            results=[
+                self.result(operation, item)
+                for operation, item in zip(batch.operations, items)
+            ]
+        )
+
+
+async def get_batch_service(db: AsyncSession = Depends(get_db)) -> BatchService:
+    return BatchService(db=db)
+
+
 @dataclass
 class DataReportService:
     db: AsyncSession
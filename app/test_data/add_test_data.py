@@ -1,52 +1,27 @@
+import asyncio
 import json
+from collections.abc import AsyncIterator
 from pathlib import Path
 
-from app.models import DishModel, MenuModel, SubmenuModel
-from app.services import DishService, MenuService, SubmenuService
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.bulk_import import import_menu_trees
 
-async def read_test_data_from_json() -> list:
+
+def load_test_data() -> list:
     with open(Path("app", "test_data", "test_data.json")) as file:
-        return json.loads(file.read())["data"]
-
-
-async def add_test_data(
-    menu_service: MenuService,
-    submenu_service: SubmenuService,
-    dishes_service: DishService,
-) -> str:
-    data = await read_test_data_from_json()
-    for menu_data in data:
-        menu = MenuModel.parse_obj(
-            {
-                "title": menu_data["title"],
-                "description": menu_data["description"],
-            }
-        )
-        new_menu = await menu_service.create_menu(menu)
-        if new_menu:
-            for submenu_data in menu_data["submenus"]:
-                submenu = SubmenuModel.parse_obj(
-                    {
-                        "title": submenu_data["title"],
-                        "description": submenu_data["description"],
-                    }
-                )
-                new_submenu = await submenu_service.create_submenu(
-                    submenu=submenu, menu_id=int(new_menu.id)
-                )
-                if new_submenu:
-                    for dish_data in submenu_data["dishes"]:
-                        dish = DishModel.parse_obj(
-                            {
-                                "title": dish_data["title"],
-                                "description": dish_data["description"],
-                                "price": dish_data["price"],
-                            }
-                        )
-                        await dishes_service.create_dish(
-                            dish=dish,
-                            menu_id=int(new_menu.id),
-                            submenu_id=int(new_submenu.id),
-                        )
+        return json.load(file)["data"]
+
+
+async def read_test_data_from_json() -> list:
+    return await asyncio.to_thread(load_test_data)
+
+
+async def iter_test_data() -> AsyncIterator[dict]:
+    for menu in await read_test_data_from_json():
+        yield menu
+
+
+async def add_test_data(db: AsyncSession) -> str:
+    await import_menu_trees(db, iter_test_data())
     return "Test data added successfully"
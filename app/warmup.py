@@ -0,0 +1,106 @@
+import asyncio
+import os
+
+from sqlalchemy import text
+
+from app import cache, crud
+from app.database import DB_POOL_SIZE, Dish, Menu, SessionLocal, Submenu, engine
+from app.services import (
+    CACHE_TTL,
+    DISH_IDS,
+    MENU_IDS,
+    SUBMENU_IDS,
+    Service,
+    dishes_list_key,
+    menu_key,
+    menus_list_key,
+    submenu_key,
+    submenus_list_key,
+)
+
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "false").lower() == "true"
+WARMUP_TOP_DISHES_LISTS = int(os.environ.get("WARMUP_TOP_DISHES_LISTS", 20))
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 5))
+
+ready = asyncio.Event()
+
+
+async def open_pool_connections(count: int) -> None:
+    connections = await asyncio.gather(*(engine.connect() for _ in range(count)))
+    try:
+        await asyncio.gather(
+            *(connection.execute(text("SELECT 1")) for connection in connections)
+        )
+    finally:
+        await asyncio.gather(*(connection.close() for connection in connections))
+
+
+async def warm_up_cache() -> None:
+    async with SessionLocal() as db:
+        menu_ids = await crud.get_ids(db, Menu)
+        submenu_sizes = await crud.get_submenu_sizes(db)
+    top_submenus = sorted(submenu_sizes, reverse=True)[:WARMUP_TOP_DISHES_LISTS]
+
+    # Names and write versions are read before the data, so a write made in between
+    # either moves the entry to a new generation or keeps it from being stored.
+    keys = [
+        (menus_list_key(), CACHE_TTL["menu"]),
+        *((menu_key(menu_id), CACHE_TTL["menu"]) for menu_id in menu_ids),
+        *((submenus_list_key(menu_id), CACHE_TTL["submenu"]) for menu_id in menu_ids),
+        *(
+            (submenu_key(menu_id, submenu_id), CACHE_TTL["submenu"])
+            for _, menu_id, submenu_id in submenu_sizes
+        ),
+        *(
+            (dishes_list_key(menu_id, submenu_id), CACHE_TTL["dish"])
+            for _, menu_id, submenu_id in top_submenus
+        ),
+    ]
+    names = await Service.cache_names([key for key, _ in keys])
+    versions = await cache.get_write_versions(names)
+    cache_names = {key[0]: name for (key, _), name in zip(keys, names)}
+
+    async with SessionLocal() as db:
+        menus = await crud.get_menus_list(db=db)
+        submenus = await crud.get_submenus_by_menu(db=db)
+        dishes = await crud.get_dishes_by_submenu(
+            db=db, submenu_ids=[submenu_id for _, _, submenu_id in top_submenus]
+        )
+
+    values = {menus_list_key()[0]: menus}
+    for menu in menus:
+        menu_id = int(menu.id)
+        values[menu_key(menu_id)[0]] = menu
+        values[submenus_list_key(menu_id)[0]] = submenus.get(menu_id, [])
+        for submenu in submenus.get(menu_id, []):
+            values[submenu_key(menu_id, int(submenu.id))[0]] = submenu
+    for _, menu_id, submenu_id in top_submenus:
+        values[dishes_list_key(menu_id, submenu_id)[0]] = dishes[submenu_id]
+
+    await cache.set_many_unless_written(
+        values={
+            cache_names[key]: value
+            for key, value in values.items()
+            if key in cache_names
+        },
+        versions=versions,
+        ttl={name: ttl for name, (_, ttl) in zip(names, keys)},
+    )
+
+
+async def rebuild_membership_filters() -> None:
+    async with SessionLocal() as db:
+        for name, model in (
+            (MENU_IDS, Menu),
+            (SUBMENU_IDS, Submenu),
+            (DISH_IDS, Dish),
+        ):
+            await cache.rebuild_membership(name, await crud.get_ids(db, model))
+
+
+async def warm_up() -> None:
+    try:
+        await open_pool_connections(min(DB_POOL_MIN_SIZE, DB_POOL_SIZE))
+        await warm_up_cache()
+    except Exception as ex:
+        print(ex)
@@ -0,0 +1,60 @@
+import json
+import timeit
+from pathlib import Path
+
+from app.cache_codecs import CODECS, EntryCodec
+
+REPEAT = 2000
+
+
+def load_payloads() -> dict:
+    with open(Path("app", "test_data", "test_data.json")) as file:
+        data = json.loads(file.read())["data"]
+    dishes = [
+        {"id": str(num), **dish}
+        for num, dish in enumerate(
+            dish
+            for menu in data
+            for submenu in menu["submenus"]
+            for dish in submenu["dishes"]
+        )
+    ]
+    menus = [
+        {
+            "id": str(num),
+            "title": menu["title"],
+            "description": menu["description"],
+            "submenus_count": len(menu["submenus"]),
+            "dishes_count": sum(len(sub["dishes"]) for sub in menu["submenus"]),
+        }
+        for num, menu in enumerate(data)
+    ]
+    return {
+        "menu": menus[0],
+        "menus_list x50": menus * 50,
+        "dishes_list x20": dishes * 20,
+    }
+
+
+def main() -> None:
+    payloads = load_payloads()
+    print(f"{'payload':<16}{'codec':<16}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    for payload_name, payload in payloads.items():
+        for codec_name in CODECS:
+            for compress_threshold in (-1, 1024):
+                codec = EntryCodec(codec_name, compress_threshold, 1)
+                entry = codec.encode(payload)
+                encode_time = timeit.timeit(
+                    lambda: codec.encode(payload), number=REPEAT
+                )
+                decode_time = timeit.timeit(lambda: codec.decode(entry), number=REPEAT)
+                label = codec_name + ("+zlib" if entry[0] & 0x80 else "")
+                print(
+                    f"{payload_name:<16}{label:<16}{len(entry):>8}"
+                    f"{encode_time / REPEAT * 1e6:>12.1f}"
+                    f"{decode_time / REPEAT * 1e6:>12.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import pytest
+import pytest_asyncio
+
+from app import cache
+from app.memory_cache import MemoryRedis
+
+
+@pytest_asyncio.fixture(scope="module", autouse=True)
+async def create_drop_database():
+    # Cache tests run on the in-memory backend and need no database.
+    yield
+
+
+@pytest.fixture
+def memory_redis(monkeypatch) -> MemoryRedis:
+    redis = MemoryRedis(max_size=100)
+    monkeypatch.setattr(cache, "redis", redis)
+    return redis
+
+
+@pytest.fixture
+def membership_filter(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "MEMBERSHIP_FILTER_ENABLED", True)
+
+
+@pytest.fixture
+def local_cache(monkeypatch) -> cache.LocalCache:
+    local_cache = cache.LocalCache(max_size=100, ttl=60)
+    local_cache.enabled = True
+    monkeypatch.setattr(cache, "local_cache", local_cache)
+    return local_cache
@@ -0,0 +1,160 @@
+import asyncio
+import zlib
+
+import pytest
+
+from app import cache
+from app.cache_codecs import COMPRESSED_FLAG, STAMPED_FLAG, EntryCodec, JsonCodec
+from app.services import Service
+
+
+class FakePubSub:
+    def __init__(self) -> None:
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.subscribed = asyncio.Event()
+
+    async def subscribe(self, channel: str) -> None:
+        self.subscribed.set()
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+    async def close(self) -> None:
+        pass
+
+
+def test_codec_header_flags():
+    codec = EntryCodec(codec="json", compress_threshold=10, compress_level=1)
+    small = codec.encode({"a": 1}, fresh_until=100)
+    assert small[0] == JsonCodec.header | STAMPED_FLAG
+    assert codec.decode_json(small) == (b'{"a":1}', 100)
+    large = codec.encode(["x" * 20])
+    assert large[0] == JsonCodec.header | COMPRESSED_FLAG
+    assert zlib.decompress(large[1:]) == b'["' + b"x" * 20 + b'"]'
+    assert codec.decode(large) == ["x" * 20]
+
+
+def test_codec_reads_legacy_plain_json():
+    codec = EntryCodec(codec="msgpack", compress_threshold=-1, compress_level=1)
+    assert codec.decode(b'{"a":1}') == {"a": 1}
+    assert codec.decode_json(b"[1]") == (b"[1]", None)
+    assert codec.decode(codec.encode_json(b"[1]")) == [1]
+
+
+@pytest.mark.asyncio
+async def test_get_entry_reports_stale_entries(memory_redis):
+    await cache.set_cache_unless_written(
+        "fresh", [1], cache.CacheTTL(fresh=60, grace=60, jitter=0), None
+    )
+    await cache.set_cache_unless_written(
+        "stale", [2], cache.CacheTTL(fresh=-1, grace=60, jitter=0), None
+    )
+    assert await cache.get_entry("fresh") == (b"[1]", False)
+    assert await cache.get_entry("stale") == (b"[2]", True)
+    assert await cache.get_entry("missing") == (None, False)
+
+
+@pytest.mark.asyncio
+async def test_load_once_runs_one_loader_per_key(memory_redis):
+    calls = 0
+    release = asyncio.Event()
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return [calls]
+
+    loads = [asyncio.create_task(cache.load_once("key", loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*loads) == [[1], [1], [1]]
+    assert calls == 1
+    assert await memory_redis.get("lock_key") is None
+
+
+@pytest.mark.asyncio
+async def test_load_once_shares_loader_errors(memory_redis):
+    async def loader():
+        await asyncio.sleep(0)
+        raise ValueError("failed")
+
+    loads = [asyncio.create_task(cache.load_once("key", loader)) for _ in range(2)]
+    results = await asyncio.gather(*loads, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert await memory_redis.get("key") is None
+
+
+@pytest.mark.asyncio
+async def test_missing_items_are_cached_as_not_found(memory_redis, membership_filter):
+    calls = 0
+
+    async def loader(db):
+        nonlocal calls
+        calls += 1
+        return None
+
+    service = Service(db=None)
+    for _ in range(2):
+        assert (
+            await service.get_cached("item", loader, cache.DEFAULT_TTL, ("ids", 1))
+            is None
+        )
+    assert calls == 1
+    assert await memory_redis.exists(cache.not_found_name("item"))
+
+
+@pytest.mark.asyncio
+async def test_invalidation_messages_drop_local_entries(
+    memory_redis, local_cache, monkeypatch
+):
+    pubsub = FakePubSub()
+    monkeypatch.setattr(memory_redis, "pubsub", lambda **kwargs: pubsub, raising=False)
+    listener = asyncio.create_task(cache.listen_invalidations())
+    await pubsub.subscribed.wait()
+    await asyncio.sleep(0)
+    local_cache.set("a", 1)
+    local_cache.set("b", 2)
+    await pubsub.messages.put({"type": "message", "data": b'["a"]'})
+    while local_cache.get("a") is not None:
+        await asyncio.sleep(0)
+    assert local_cache.get("b") == 2
+    listener.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await listener
+    assert not local_cache.enabled
+    assert local_cache.get("b") is None
+
+
+@pytest.mark.asyncio
+async def test_refresh_blocked_by_another_worker_is_not_shared(
+    memory_redis, monkeypatch
+):
+    set_value = memory_redis.set
+
+    async def slow_set(*args, **kwargs):
+        await asyncio.sleep(0)
+        return await set_value(*args, **kwargs)
+
+    monkeypatch.setattr(memory_redis, "set", slow_set)
+    monkeypatch.setattr(cache, "REDIS_LOCK_WAIT_TIME", 0.1)
+    await set_value("lock_key", "other worker")
+
+    async def loader():
+        return [1]
+
+    refresh = asyncio.create_task(cache.refresh("key", loader))
+    await asyncio.sleep(0)
+    assert await cache.load_once("key", loader) == [1]
+    await refresh
+
+
+@pytest.mark.asyncio
+async def test_get_many_and_delete_cache(memory_redis, local_cache):
+    await cache.set_many({"first": [1], "second": [2]})
+    entries = await cache.get_many(["first", "missing", "second"])
+    assert [entry and entry[0] for entry in entries] == [b"[1]", None, b"[2]"]
+    assert await cache.delete_cache(["first", "second"]) == 2
+    assert local_cache.get("first") is None
+    assert await cache.get_many(["first", "second"]) == [None, None]
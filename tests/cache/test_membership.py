@@ -0,0 +1,39 @@
+import pytest
+
+from app import cache
+
+
+@pytest.mark.asyncio
+async def test_membership_missing_filter_lets_ids_through(
+    memory_redis, membership_filter
+):
+    assert await cache.is_member("ids", 5)
+
+
+@pytest.mark.asyncio
+async def test_membership_missing_filter_is_not_created_by_writes(
+    memory_redis, membership_filter
+):
+    await cache.set_membership("ids", [100], True)
+    assert not await memory_redis.exists("ids")
+    assert await cache.is_member("ids", 5)
+
+
+@pytest.mark.asyncio
+async def test_membership_rebuilt_filter(memory_redis, membership_filter):
+    await cache.rebuild_membership("ids", [5])
+    await cache.set_membership("ids", [100], True)
+    await cache.set_membership("ids", [5], False)
+    assert await cache.is_member("ids", 100)
+    assert not await cache.is_member("ids", 5)
+    assert not await cache.is_member("ids", 6)
+
+
+@pytest.mark.asyncio
+async def test_membership_rebuild_keeps_concurrent_writes(
+    memory_redis, membership_filter
+):
+    await cache.rebuild_membership("ids", [1])
+    await cache.set_membership("ids", [2], True)
+    await cache.rebuild_membership("ids", [1])
+    assert await cache.is_member("ids", 2)
@@ -0,0 +1,109 @@
+import pytest
+
+from app.memory_cache import MemoryRedis
+
+
+@pytest.mark.asyncio
+async def test_set_nx_and_keepttl():
+    redis = MemoryRedis(max_size=10)
+    assert await redis.set("key", "a", ex=60)
+    assert await redis.set("key", "b", nx=True) is None
+    expires_at = redis._items["key"][0]
+    assert await redis.set("key", "c", keepttl=True)
+    assert await redis.get("key") == b"c"
+    assert redis._items["key"][0] == expires_at
+    assert await redis.set("key", "d")
+    assert redis._items["key"][0] is None
+
+
+@pytest.mark.asyncio
+async def test_expired_keys_are_missing():
+    redis = MemoryRedis(max_size=10)
+    await redis.set("key", "a", px=-1)
+    assert await redis.get("key") is None
+    assert not await redis.exists("key")
+    assert not await redis.expire("key", 60)
+
+
+@pytest.mark.asyncio
+async def test_incr_keeps_expiry():
+    redis = MemoryRedis(max_size=10)
+    assert await redis.incr("counter") == 1
+    assert await redis.expire("counter", 60)
+    expires_at = redis._items["counter"][0]
+    assert await redis.incr("counter") == 2
+    assert redis._items["counter"][0] == expires_at
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used():
+    redis = MemoryRedis(max_size=2)
+    await redis.set("a", 1)
+    await redis.set("b", 2)
+    await redis.get("a")
+    await redis.set("c", 3)
+    assert await redis.mget(["a", "b", "c"]) == [b"1", None, b"3"]
+
+
+@pytest.mark.asyncio
+async def test_setbit_getbit():
+    redis = MemoryRedis(max_size=10)
+    assert await redis.setbit("bits", 9, 1) == 0
+    assert await redis.get("bits") == bytes([0, 0b01000000])
+    assert await redis.getbit("bits", 9) == 1
+    assert await redis.getbit("bits", 8) == 0
+    assert await redis.getbit("bits", 100) == 0
+    assert await redis.setbit("bits", 9, 0) == 1
+    assert await redis.getbit("bits", 9) == 0
+
+
+@pytest.mark.asyncio
+async def test_bitop_or():
+    redis = MemoryRedis(max_size=10)
+    await redis.setbit("a", 1, 1)
+    await redis.setbit("b", 12, 1)
+    assert await redis.bitop("OR", "a", "a", "b", "missing") == 2
+    assert [await redis.getbit("a", offset) for offset in (1, 12, 2)] == [1, 1, 0]
+
+
+@pytest.mark.asyncio
+async def test_bitop_rejects_other_operations():
+    redis = MemoryRedis(max_size=10)
+    with pytest.raises(ValueError):
+        await redis.bitop("AND", "a", "b")
+
+
+@pytest.mark.asyncio
+async def test_pipeline_queues_commands():
+    redis = MemoryRedis(max_size=10)
+    async with redis.pipeline() as pipe:
+        pipe.set("a", 1).incr("a")
+        assert await redis.get("a") is None
+        assert await pipe.execute() == [True, 2]
+    with pytest.raises(AttributeError):
+        pipe.flushall
+
+
+@pytest.mark.asyncio
+async def test_transaction_runs_reads_before_multi():
+    redis = MemoryRedis(max_size=10)
+    await redis.set("a", 1)
+
+    async def update(pipe) -> None:
+        value = int(await pipe.get("a"))
+        pipe.multi()
+        pipe.set("a", value + 1)
+        pipe.delete("b")
+
+    assert await redis.transaction(update, "a") == [True, 0]
+    assert await redis.get("a") == b"2"
+
+
+@pytest.mark.asyncio
+async def test_transaction_without_multi_runs_nothing():
+    redis = MemoryRedis(max_size=10)
+
+    async def update(pipe) -> None:
+        await pipe.exists("a")
+
+    assert await redis.transaction(update, "a") == []
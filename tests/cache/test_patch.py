@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+
+from app import cache
+from app.bulk_import import cache_imported
+from app.models import ParentCountsModel, ResponseDishModel
+from app.services import (
+    DishService,
+    Service,
+    SubmenuService,
+    dish_key,
+    dishes_list_key,
+    menu_key,
+    menu_tree_key,
+    menus_list_key,
+    put_item,
+    remove_item,
+    submenu_key,
+    submenus_list_key,
+    update_fields,
+    update_item,
+)
+
+
+@pytest.mark.asyncio
+async def test_patch_many_drops_loads_started_before_the_write(memory_redis):
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def loader():
+        started.set()
+        await release.wait()
+        return [{"id": "1"}]
+
+    load = asyncio.create_task(cache.load_once("menus_list", loader))
+    await started.wait()
+    await cache.patch_many(["menus_list"], lambda values: values)
+    release.set()
+    assert await load == [{"id": "1"}]
+    assert await memory_redis.get("menus_list") is None
+
+
+@pytest.mark.asyncio
+async def test_set_many_skips_entries_written_after_their_versions(memory_redis):
+    versions = await cache.get_write_versions(["menus_list", "menu_1"])
+    await cache.patch_many(["menu_1"], lambda values: values)
+    await cache.set_many_unless_written(
+        {"menus_list": [{"id": "1"}], "menu_1": {"id": "1"}}, versions
+    )
+    assert await cache.get_cache("menus_list") == [{"id": "1"}]
+    assert await memory_redis.get("menu_1") is None
+
+
+@pytest.mark.asyncio
+async def test_load_once_stores_loads_without_concurrent_writes(memory_redis):
+    async def loader():
+        return [{"id": "1"}]
+
+    await cache.load_once("menus_list", loader)
+    assert await cache.get_cache("menus_list") == [{"id": "1"}]
+
+
+@pytest.mark.asyncio
+async def test_dish_created_drops_local_not_found_entry(memory_redis, local_cache):
+    not_found = cache.not_found_name(await Service.cache_name(dish_key(1, 2, 3)))
+    await cache.set_cache_unless_written(not_found, True, cache.NOT_FOUND_TTL, None)
+    assert local_cache.get(not_found) is not None
+    dish = ResponseDishModel(id="3", title="Dish", description="", price="1.00")
+    counts = ParentCountsModel(submenus_count=1, dishes_count=1, submenu_dishes_count=1)
+    await DishService.cache_created(menu_id=1, submenu_id=2, dish=dish, counts=counts)
+    assert local_cache.get(not_found) is None
+    assert await memory_redis.get(not_found) is None
+
+
+async def store(name: str, value) -> None:
+    await cache.set_cache_unless_written(name, value, cache.DEFAULT_TTL, None)
+
+
+def test_list_patchers_skip_uncached_lists():
+    assert put_item(None, {"id": "1"}) is None
+    assert update_item(None, 1, {"title": "a"}) is None
+    assert remove_item(None, 1) is None
+
+
+def test_list_patchers():
+    items = [{"id": "1", "title": "a"}, {"id": "2", "title": "b"}]
+    assert put_item(items, {"id": "3"}) == [*items, {"id": "3"}]
+    assert update_item(items, 2, {"title": "c"}) == [
+        {"id": "1", "title": "a"},
+        {"id": "2", "title": "c"},
+    ]
+    assert remove_item(items, "1") == [{"id": "2", "title": "b"}]
+
+
+def test_put_item_replaces_loaded_item():
+    items = [{"id": "1", "title": "a"}, {"id": "2", "title": "b"}]
+    assert put_item(items, {"id": "2", "title": "c"}) == [
+        {"id": "1", "title": "a"},
+        {"id": "2", "title": "c"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_patch_many(memory_redis):
+    await store("cached", {"id": "1", "count": 1})
+    await store("deleted", {"id": "2"})
+    await cache.patch_many(
+        ["cached", "missing", "deleted"],
+        lambda values: {
+            "cached": update_fields(values["cached"], {"count": 2}),
+            "missing": update_fields(values["missing"], {"count": 2}),
+            "deleted": cache.DELETE,
+        },
+        generations=["generation"],
+    )
+    assert await cache.get_cache("cached") == {"id": "1", "count": 2}
+    assert await memory_redis.get("missing") is None
+    assert await memory_redis.get("deleted") is None
+    assert await cache.get_generations(["generation"]) == [1]
+    assert await cache.get_write_version("missing") == b"1"
+
+
+@pytest.mark.asyncio
+async def test_submenu_deleted_sets_menu_counters(memory_redis):
+    menus_list, menu_name, submenus_list = await Service.cache_names(
+        [menus_list_key(), menu_key(1), submenus_list_key(1)]
+    )
+    menu = {"id": "1", "submenus_count": 2, "dishes_count": 5}
+    await store(menus_list, [menu])
+    await store(menu_name, menu)
+    await store(submenus_list, [{"id": "2", "dishes_count": 3}, {"id": "4"}])
+    counts = ParentCountsModel(submenus_count=1, dishes_count=2)
+    await SubmenuService.cache_deleted(menu_id=1, submenu_id=2, counts=counts)
+    expected = {"id": "1", "submenus_count": 1, "dishes_count": 2}
+    assert await cache.get_cache(menus_list) == [expected]
+    assert await cache.get_cache(menu_name) == expected
+    assert await cache.get_cache(submenus_list) == [{"id": "4"}]
+
+
+@pytest.mark.asyncio
+async def test_dish_created_after_a_load_that_saw_it(memory_redis):
+    menus_list, submenus_list, submenu_name, dishes_list = await Service.cache_names(
+        [
+            menus_list_key(),
+            submenus_list_key(1),
+            submenu_key(1, 2),
+            dishes_list_key(1, 2),
+        ]
+    )
+    # The lists were loaded after the dish was committed, but before the patch.
+    await store(menus_list, [{"id": "1", "submenus_count": 1, "dishes_count": 2}])
+    await store(submenus_list, [{"id": "2", "dishes_count": 2}])
+    await store(submenu_name, {"id": "2", "dishes_count": 2})
+    await store(dishes_list, [{"id": "1"}, {"id": "2"}])
+    dish = ResponseDishModel(id="2", title="Dish", description="", price="1.00")
+    counts = ParentCountsModel(submenus_count=1, dishes_count=2, submenu_dishes_count=2)
+    await DishService.cache_created(menu_id=1, submenu_id=2, dish=dish, counts=counts)
+    dishes = await cache.get_cache(dishes_list)
+    assert [item["id"] for item in dishes] == ["1", "2"]
+    assert (await cache.get_cache(submenu_name))["dishes_count"] == 2
+    assert (await cache.get_cache(submenus_list))[0]["dishes_count"] == 2
+    assert (await cache.get_cache(menus_list))[0]["dishes_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_dish_deleted_twice_keeps_counters(memory_redis):
+    submenu_name = await Service.cache_name(submenu_key(1, 2))
+    await store(submenu_name, {"id": "2", "dishes_count": 1})
+    counts = ParentCountsModel(submenus_count=1, dishes_count=1, submenu_dishes_count=1)
+    for _ in range(2):
+        await DishService.cache_deleted(
+            menu_id=1, submenu_id=2, dish_id=3, counts=counts
+        )
+    assert (await cache.get_cache(submenu_name))["dishes_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_imported_menus_invalidate_their_trees(memory_redis):
+    keys = [menu_tree_key(1), menu_key(1), menus_list_key()]
+    names = await Service.cache_names(keys)
+    await cache_imported({"menu": [1], "submenu": [], "dish": []})
+    assert all(old != new for old, new in zip(names, await Service.cache_names(keys)))
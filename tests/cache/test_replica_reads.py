@@ -0,0 +1,35 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import cache
+from app.services import REPLICA_CACHE_TTL, Service
+
+
+async def loader(db):
+    return [{"id": "1"}]
+
+
+@pytest.mark.asyncio
+async def test_replica_loads_expire_with_the_replica_lag(memory_redis):
+    service = Service(db=SimpleNamespace(info={"replica": True}))
+    await service.get_cached("items", loader, cache.DEFAULT_TTL)
+    expires_at = memory_redis._items["items"][0]
+    assert expires_at <= time.monotonic() + REPLICA_CACHE_TTL.fresh
+
+
+@pytest.mark.asyncio
+async def test_primary_loads_keep_their_ttl(memory_redis):
+    service = Service(db=SimpleNamespace(info={}))
+    await service.get_cached("items", loader, cache.DEFAULT_TTL)
+    expires_at = memory_redis._items["items"][0]
+    assert expires_at > time.monotonic() + REPLICA_CACHE_TTL.fresh
+
+
+@pytest.mark.asyncio
+async def test_clients_reading_own_writes_skip_cached_entries(memory_redis):
+    await cache.set_cache_unless_written("items", [], cache.DEFAULT_TTL, None)
+    service = Service(db=SimpleNamespace(info={}, reads_own_writes=True))
+    assert await service.get_cached("items", loader, cache.DEFAULT_TTL) == [{"id": "1"}]
+    assert await cache.get_cache("items") == [{"id": "1"}]
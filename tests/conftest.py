@@ -6,10 +6,12 @@ import asyncpg
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.database import Base
+from app.instrumentation import instrument
 from app.main import app
 from app.services import get_db
 
@@ -18,6 +20,8 @@ DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_URL = os.environ.get("DB_URL")
 DB_NAME = os.environ.get("DB_NAME")
 
+test_engine: AsyncEngine | None = None
+
 
 async def execute_db(command: str):
     conn = None
@@ -54,10 +58,12 @@ async def kill_all_connections():
 
 
 async def create_test_session_local():
+    global test_engine
     TEST_DB_CONFIG = (
         f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_URL}/test_{DB_NAME}"
     )
     test_engine = create_async_engine(TEST_DB_CONFIG, echo=True)
+    instrument(test_engine.sync_engine)
     TestSessionLocal = sessionmaker(
         autocommit=False,
         autoflush=False,
@@ -99,7 +105,28 @@ async def create_drop_database():
     await drop_test_db()
 
 
+@pytest.fixture
+def executed_statements() -> Generator:
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(
+        test_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    yield statements
+    event.remove(
+        test_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+
+
 @pytest_asyncio.fixture
 async def async_client() -> AsyncClient:
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
+
+
+@pytest.fixture
+def db_engine() -> AsyncEngine:
+    return test_engine
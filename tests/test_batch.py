@@ -0,0 +1,218 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_batch_post_menu(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus",
+        json={
+            "title": "My menu 1",
+            "description": "My menu description 1",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_batch_post_submenu(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus/1/submenus",
+        json={
+            "title": "My submenu 1",
+            "description": "My submenu description 1",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_batch_get_submenu(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/submenus/1")
+    assert response.status_code == 200
+    assert response.json()["dishes_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_create_dishes(async_client: AsyncClient):
+    dish = {"title": "My dish", "description": "My dish description", "price": 12.5}
+    response = await async_client.post(
+        "api/v1/batch",
+        json={
+            "operations": [
+                {
+                    "action": "create",
+                    "target": "dish",
+                    "menu_id": 1,
+                    "submenu_id": 1,
+                    "data": dish,
+                },
+                {
+                    "action": "create",
+                    "target": "dish",
+                    "menu_id": 1,
+                    "submenu_id": 1,
+                    "data": dish,
+                },
+                {
+                    "action": "create",
+                    "target": "dish",
+                    "menu_id": 1,
+                    "submenu_id": 2,
+                    "data": dish,
+                },
+            ]
+        },
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [201, 201, 404]
+    assert results[0]["item"] == {
+        "id": "1",
+        "title": "My dish",
+        "description": "My dish description",
+        "price": "12.50",
+    }
+    assert results[2]["detail"] == "submenu not found"
+
+
+@pytest.mark.asyncio
+async def test_batch_get_submenu_after_create(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/submenus/1")
+    assert response.status_code == 200
+    assert response.json()["dishes_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_update_and_delete_dishes(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/batch",
+        json={
+            "operations": [
+                {
+                    "action": "update",
+                    "target": "dish",
+                    "menu_id": 1,
+                    "submenu_id": 1,
+                    "id": 1,
+                    "data": {"price": 14.5},
+                },
+                {
+                    "action": "delete",
+                    "target": "dish",
+                    "menu_id": 1,
+                    "submenu_id": 1,
+                    "id": 2,
+                },
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [200, 200]
+
+
+@pytest.mark.asyncio
+async def test_batch_get_dishes_list(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/submenus/1/dishes")
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "id": "1",
+            "title": "My dish",
+            "description": "My dish description",
+            "price": "14.50",
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_get_menu(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1")
+    assert response.status_code == 200
+    assert response.json()["submenus_count"] == 1
+    assert response.json()["dishes_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_missing_parent_ids(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/batch",
+        json={"operations": [{"action": "delete", "target": "dish", "id": 1}]},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_repeated_target(async_client: AsyncClient):
+    operation = {"action": "delete", "target": "dish", "id": 1, "menu_id": 1}
+    response = await async_client.post(
+        "api/v1/batch",
+        json={"operations": [{**operation, "submenu_id": 1}] * 2},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_child_of_deleted_parent(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/batch",
+        json={
+            "operations": [
+                {"action": "delete", "target": "submenu", "id": 1, "menu_id": 1},
+                {
+                    "action": "create",
+                    "target": "dish",
+                    "menu_id": 1,
+                    "submenu_id": 1,
+                    "data": {"title": "Dish", "description": "", "price": 1},
+                },
+            ]
+        },
+    )
+    assert response.status_code == 422
+    response = await async_client.get("api/v1/menus/1/submenus/1")
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_batch_keeps_concurrent_counter_updates(async_client: AsyncClient):
+    dish = {"title": "Dish", "description": "", "price": 1}
+    await asyncio.gather(
+        async_client.post(
+            "api/v1/batch",
+            json={
+                "operations": [
+                    {
+                        "action": "create",
+                        "target": "dish",
+                        "menu_id": 1,
+                        "submenu_id": 1,
+                        "data": dish,
+                    }
+                ]
+            },
+        ),
+        async_client.post("api/v1/menus/1/submenus/1/dishes", json=dish),
+    )
+    response = await async_client.get("api/v1/menus/1")
+    assert response.json()["dishes_count"] == 3
+    response = await async_client.get("api/v1/menus/1/submenus/1")
+    assert response.json()["dishes_count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_delete_submenu_counters(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/batch",
+        json={
+            "operations": [
+                {"action": "delete", "target": "submenu", "id": 1, "menu_id": 1}
+            ]
+        },
+    )
+    assert response.status_code == 200
+    response = await async_client.get("api/v1/menus/1")
+    assert response.json()["submenus_count"] == 0
+    assert response.json()["dishes_count"] == 0
@@ -0,0 +1,89 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_cascade_post_menu(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus",
+        json={
+            "title": "My menu 1",
+            "description": "My menu description 1",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("submenu_id", [1, 2])
+async def test_cascade_post_submenu(async_client: AsyncClient, submenu_id: int):
+    response = await async_client.post(
+        "api/v1/menus/1/submenus",
+        json={
+            "title": f"My submenu {submenu_id}",
+            "description": f"My submenu description {submenu_id}",
+        },
+    )
+    assert response.status_code == 201
+    assert response.json()["id"] == str(submenu_id)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("submenu_id", [1, 1, 2, 2])
+async def test_cascade_post_dish(async_client: AsyncClient, submenu_id: int):
+    response = await async_client.post(
+        f"api/v1/menus/1/submenus/{submenu_id}/dishes",
+        json={
+            "title": "My dish",
+            "description": "My dish description",
+            "price": "12.50",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_cascade_delete_submenu(
+    async_client: AsyncClient, executed_statements: list
+):
+    response = await async_client.delete("api/v1/menus/1/submenus/1")
+    assert response.status_code == 200
+    assert len(executed_statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_cascade_get_submenu_dishes_deleted(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/submenus/1/dishes/1")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "dish not found"}
+
+
+@pytest.mark.asyncio
+async def test_cascade_get_menu_after_submenu_delete(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1")
+    assert response.status_code == 200
+    assert response.json()["submenus_count"] == 1
+    assert response.json()["dishes_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cascade_delete_menu(
+    async_client: AsyncClient, executed_statements: list
+):
+    response = await async_client.delete("api/v1/menus/1")
+    assert response.status_code == 200
+    assert len(executed_statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_cascade_get_submenu_deleted(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/submenus/2")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "submenu not found"}
+
+
+@pytest.mark.asyncio
+async def test_cascade_get_menu_dishes_deleted(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/submenus/2/dishes/3")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "dish not found"}
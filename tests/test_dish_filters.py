@@ -0,0 +1,174 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("menu_id", [1, 2])
+async def test_dish_filters_post_menu(async_client: AsyncClient, menu_id: int):
+    response = await async_client.post(
+        "api/v1/menus",
+        json={
+            "title": f"My menu {menu_id}",
+            "description": f"My menu description {menu_id}",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("menu_id", [1, 2])
+async def test_dish_filters_post_submenu(async_client: AsyncClient, menu_id: int):
+    response = await async_client.post(
+        f"api/v1/menus/{menu_id}/submenus",
+        json={
+            "title": f"My submenu {menu_id}",
+            "description": f"My submenu description {menu_id}",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "menu_id, title, price",
+    [
+        (1, "C dish", "30.00"),
+        (1, "A dish", "10.00"),
+        (1, "B dish", "20.00"),
+        (2, "D dish", "15.00"),
+    ],
+)
+async def test_dish_filters_post_dish(
+    async_client: AsyncClient, menu_id: int, title: str, price: str
+):
+    response = await async_client.post(
+        f"api/v1/menus/{menu_id}/submenus/{menu_id}/dishes",
+        json={
+            "title": title,
+            "description": f"{title} description",
+            "price": price,
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_sort_by_price(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/menus/1/submenus/1/dishes", params={"sort": "price"}
+    )
+    assert response.status_code == 200
+    assert [dish["price"] for dish in response.json()] == ["10.00", "20.00", "30.00"]
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_sort_by_title(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/menus/1/submenus/1/dishes", params={"sort": "title"}
+    )
+    assert response.status_code == 200
+    assert [dish["title"] for dish in response.json()] == [
+        "A dish",
+        "B dish",
+        "C dish",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_price_range(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/menus/1/submenus/1/dishes",
+        params={"min_price": "15", "max_price": "25"},
+    )
+    assert response.status_code == 200
+    assert [dish["title"] for dish in response.json()] == ["B dish"]
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_pages_by_price(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/menus/1/submenus/1/dishes", params={"sort": "price", "limit": 2}
+    )
+    assert response.status_code == 200
+    assert [dish["price"] for dish in response.json()] == ["10.00", "20.00"]
+    next_response = await async_client.get(response.links["next"]["url"])
+    assert next_response.status_code == 200
+    assert [dish["price"] for dish in next_response.json()] == ["30.00"]
+    assert "link" not in next_response.headers
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_query_dishes(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/dishes", params={"sort": "price", "max_price": "20"}
+    )
+    assert response.status_code == 200
+    assert [
+        (dish["title"], dish["menu_id"], dish["submenu_id"]) for dish in response.json()
+    ] == [("A dish", "1", "1"), ("D dish", "2", "2"), ("B dish", "1", "1")]
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_patch_dish(async_client: AsyncClient):
+    response = await async_client.patch(
+        "api/v1/menus/1/submenus/1/dishes/1",
+        json={"price": "5.00"},
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_sort_by_price_after_update(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/menus/1/submenus/1/dishes", params={"sort": "price"}
+    )
+    assert response.status_code == 200
+    assert [dish["title"] for dish in response.json()] == [
+        "C dish",
+        "A dish",
+        "B dish",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_query_dishes_after_update(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/dishes", params={"sort": "price", "max_price": "20"}
+    )
+    assert response.status_code == 200
+    assert [dish["title"] for dish in response.json()] == [
+        "C dish",
+        "A dish",
+        "D dish",
+        "B dish",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_invalid_sort(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/menus/1/submenus/1/dishes", params={"sort": "description"}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_page_after_deleted_dish(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/menus/1/submenus/1/dishes", params={"sort": "price", "limit": 2}
+    )
+    assert response.status_code == 200
+    assert [dish["title"] for dish in response.json()] == ["C dish", "A dish"]
+    deleted = await async_client.delete("api/v1/menus/1/submenus/1/dishes/2")
+    assert deleted.status_code == 200
+    next_response = await async_client.get(response.links["next"]["url"])
+    assert next_response.status_code == 200
+    assert [dish["title"] for dish in next_response.json()] == ["B dish"]
+
+
+@pytest.mark.asyncio
+async def test_dish_filters_invalid_cursor(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/menus/1/submenus/1/dishes", params={"sort": "price", "cursor": "MQ"}
+    )
+    assert response.status_code == 400
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+from httpx import AsyncClient
+
+MENU_TREES = [
+    {
+        "title": "My menu 1",
+        "description": "My menu description 1",
+        "submenus": [
+            {
+                "title": "My submenu 1",
+                "description": "My submenu description 1",
+                "dishes": [
+                    {
+                        "title": "My dish 1",
+                        "description": "My dish description 1",
+                        "price": 12.5,
+                    },
+                    {
+                        "title": "My dish 2",
+                        "description": "My dish description 2",
+                        "price": 13.5,
+                    },
+                ],
+            },
+            {
+                "title": "My submenu 2",
+                "description": "My submenu description 2",
+            },
+        ],
+    },
+    {
+        "title": "My menu 2",
+        "description": "My menu description 2",
+    },
+]
+
+
+@pytest.mark.asyncio
+async def test_import_menu_trees(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/import",
+        content="\n".join(json.dumps(tree) for tree in MENU_TREES),
+    )
+    assert response.status_code == 201
+    assert response.json() == {"menu": 2, "submenu": 2, "dish": 2}
+
+
+@pytest.mark.asyncio
+async def test_import_get_menus_list(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus")
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "id": "1",
+            "title": "My menu 1",
+            "description": "My menu description 1",
+            "submenus_count": 2,
+            "dishes_count": 2,
+        },
+        {
+            "id": "2",
+            "title": "My menu 2",
+            "description": "My menu description 2",
+            "submenus_count": 0,
+            "dishes_count": 0,
+        },
+    ]
+
+
+@pytest.mark.asyncio
+async def test_import_get_dishes_list(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/submenus/1/dishes")
+    assert response.status_code == 200
+    assert [dish["price"] for dish in response.json()] == ["12.50", "13.50"]
+
+
+@pytest.mark.asyncio
+async def test_import_invalid_tree(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/import", content=json.dumps({"title": "My menu 3"})
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_import_invalid_tree_rolled_back(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus")
+    assert len(response.json()) == 2
@@ -0,0 +1,73 @@
+import json
+import logging
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+
+from app import instrumentation
+
+
+@pytest.fixture
+def record_all_queries(monkeypatch):
+    monkeypatch.setattr(instrumentation, "DB_SLOW_QUERY_TIME", 0)
+    monkeypatch.setattr(instrumentation, "DB_QUERY_SAMPLE_RATE", 1)
+    monkeypatch.setattr(instrumentation, "query_stats", {})
+    monkeypatch.setattr(instrumentation, "DB_QUERY_STATS_ENABLED", True)
+
+
+@pytest.mark.asyncio
+async def test_instrumentation_slow_query_log(
+    async_client: AsyncClient, record_all_queries, caplog
+):
+    with caplog.at_level(logging.WARNING, logger="app.sql"):
+        response = await async_client.post(
+            "api/v1/menus",
+            json={
+                "title": "My menu 1",
+                "description": "My menu description 1",
+            },
+        )
+    assert response.status_code == 201
+    records = [json.loads(record.getMessage()) for record in caplog.records]
+    insert = next(
+        record for record in records if record["statement"].startswith("INSERT")
+    )
+    assert insert["event"] == "slow_query"
+    assert insert["route"] == "create_menu_handler"
+    assert insert["rows"] == 1
+    assert "My menu 1" not in insert["statement"]
+
+
+def test_instrumentation_row_count():
+    assert instrumentation.row_count(SimpleNamespace(rowcount=2, _rows=[])) == 2
+    select = SimpleNamespace(rowcount=-1, _rows=[(1,), (2,), (3,)])
+    assert instrumentation.row_count(select) == 3
+    stream = SimpleNamespace(rowcount=-1, _rows=[], server_side=True)
+    assert instrumentation.row_count(stream) is None
+
+
+@pytest.mark.asyncio
+async def test_instrumentation_query_stats(
+    async_client: AsyncClient, record_all_queries
+):
+    for menu_id in (2, 3):
+        await async_client.post(
+            "api/v1/menus",
+            json={
+                "title": f"My menu {menu_id}",
+                "description": f"My menu description {menu_id}",
+            },
+        )
+    response = await async_client.get("api/v1/health/queries")
+    assert response.status_code == 200
+    insert = next(
+        stats for stats in response.json() if stats["statement"].startswith("INSERT")
+    )
+    assert insert["estimated_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_instrumentation_query_stats_disabled(async_client: AsyncClient):
+    response = await async_client.get("api/v1/health/queries")
+    assert response.status_code == 404
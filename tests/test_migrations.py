@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.database import SEARCH_CONFIG, Base
+from app.migrations import MIGRATIONS, SEARCH_VECTOR, migrate
+
+# The schema the service shipped with, before any migration existed.
+BASELINE_SCHEMA = (
+    "CREATE TABLE menus ("
+    "id SERIAL PRIMARY KEY, title VARCHAR NOT NULL, description VARCHAR NOT NULL)",
+    "CREATE TABLE submenus ("
+    "id SERIAL PRIMARY KEY, title VARCHAR NOT NULL, description VARCHAR NOT NULL, "
+    "menu_id INTEGER REFERENCES menus (id))",
+    "CREATE TABLE dishes ("
+    "id SERIAL PRIMARY KEY, title VARCHAR NOT NULL, description VARCHAR NOT NULL, "
+    "price NUMERIC(10, 2) NOT NULL, submenu_id INTEGER REFERENCES submenus (id))",
+    "INSERT INTO menus (title, description) VALUES ('Menu', 'Menu description')",
+    "INSERT INTO submenus (title, description, menu_id) "
+    "VALUES ('Submenu', 'Submenu description', 1)",
+    "INSERT INTO dishes (title, description, price, submenu_id) "
+    "VALUES ('Soup', 'Hot soup', 10, 1), ('Salad', 'Green salad', 20, 1)",
+)
+
+
+@pytest.mark.asyncio
+async def test_migrations_upgrade_baseline_schema(db_engine):
+    async with db_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+        for statement in BASELINE_SCHEMA:
+            await conn.execute(text(statement))
+    # Workers start together, the one that waits must not block the index builds.
+    await asyncio.wait_for(
+        asyncio.gather(
+            migrate(db_engine, Base.metadata), migrate(db_engine, Base.metadata)
+        ),
+        timeout=60,
+    )
+    async with db_engine.connect() as conn:
+        versions = await conn.scalars(text("SELECT version FROM schema_migrations"))
+        assert sorted(versions) == [migration.version for migration in MIGRATIONS]
+        counters = await conn.execute(
+            text("SELECT submenus_counter, dishes_counter FROM menus")
+        )
+        assert counters.all() == [(1, 2)]
+        for migration in MIGRATIONS:
+            if migration.index is not None:
+                is_valid = await conn.scalar(
+                    text(
+                        "SELECT indisvalid FROM pg_index "
+                        "WHERE indexrelid = to_regclass(:name)"
+                    ),
+                    {"name": migration.index},
+                )
+                assert is_valid, migration.index
+        foreign_keys = await conn.execute(
+            text(
+                "SELECT conname, confdeltype, convalidated FROM pg_constraint "
+                "WHERE contype = 'f' ORDER BY conname"
+            )
+        )
+        assert foreign_keys.all() == [
+            ("dishes_submenu_id_fkey", "c", True),
+            ("submenus_menu_id_fkey", "c", True),
+        ]
+        matches = await conn.scalar(
+            text(
+                f"SELECT count(*) FROM dishes WHERE {SEARCH_VECTOR} "
+                f"@@ to_tsquery('{SEARCH_CONFIG}', 'soup')"
+            )
+        )
+        assert matches == 1
@@ -0,0 +1,72 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_pagination_post_menu(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus",
+        json={
+            "title": "My menu 1",
+            "description": "My menu description 1",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("submenu_id", [1, 2, 3])
+async def test_pagination_post_submenu(async_client: AsyncClient, submenu_id: int):
+    response = await async_client.post(
+        "api/v1/menus/1/submenus",
+        json={
+            "title": f"My submenu {submenu_id}",
+            "description": f"My submenu description {submenu_id}",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_pagination_get_submenus_list_unpaged(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/submenus")
+    assert response.status_code == 200
+    assert [submenu["id"] for submenu in response.json()] == ["1", "2", "3"]
+    assert "link" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_pagination_get_submenus_pages(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/submenus?limit=2")
+    assert response.status_code == 200
+    assert [submenu["id"] for submenu in response.json()] == ["1", "2"]
+    assert response.json()[0]["dishes_count"] == 0
+    assert response.links["next"]["url"]
+
+    response = await async_client.get(response.links["next"]["url"])
+    assert response.status_code == 200
+    assert [submenu["id"] for submenu in response.json()] == ["3"]
+    assert "link" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_pagination_get_page_after_create(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus/1/submenus",
+        json={
+            "title": "My submenu 4",
+            "description": "My submenu description 4",
+        },
+    )
+    assert response.status_code == 201
+
+    response = await async_client.get("api/v1/menus/1/submenus?limit=2")
+    response = await async_client.get(response.links["next"]["url"])
+    assert [submenu["id"] for submenu in response.json()] == ["3", "4"]
+
+
+@pytest.mark.asyncio
+async def test_pagination_invalid_cursor(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/submenus?cursor=!")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
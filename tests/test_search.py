@@ -0,0 +1,96 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_search_post_menu(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus",
+        json={
+            "title": "Меню",
+            "description": "Основное меню",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_search_post_submenu(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus/1/submenus",
+        json={
+            "title": "Холодные закуски",
+            "description": "К пиву",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_search_post_dish(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus/1/submenus/1/dishes",
+        json={
+            "title": "Сельдь Бисмарк",
+            "description": "Закуска из маринованной сельди",
+            "price": "182.99",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_search_dish_by_prefix(async_client: AsyncClient):
+    response = await async_client.get("api/v1/search", params={"q": "бисм"})
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "type": "dish",
+            "id": "1",
+            "title": "Сельдь Бисмарк",
+            "description": "Закуска из маринованной сельди",
+            "price": "182.99",
+            "menu_id": "1",
+            "submenu_id": "1",
+            "rank": response.json()[0]["rank"],
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_pages(async_client: AsyncClient):
+    response = await async_client.get(
+        "api/v1/search", params={"q": "закуски", "limit": 1}
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    next_url = response.links["next"]["url"]
+    next_response = await async_client.get(next_url)
+    assert next_response.status_code == 200
+    assert {response.json()[0]["type"], next_response.json()[0]["type"]} == {
+        "dish",
+        "submenu",
+    }
+
+
+@pytest.mark.asyncio
+async def test_search_patch_dish(async_client: AsyncClient):
+    response = await async_client.patch(
+        "api/v1/menus/1/submenus/1/dishes/1",
+        json={"title": "Сельдь под шубой"},
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_search_after_update(async_client: AsyncClient):
+    response = await async_client.get("api/v1/search", params={"q": "бисм"})
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_search_invalid_query(async_client: AsyncClient):
+    response = await async_client.get("api/v1/search", params={"q": "!!!"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid search query"
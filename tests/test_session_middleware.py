@@ -0,0 +1,81 @@
+import pytest
+import pytest_asyncio
+from fastapi import Request
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import main
+from app.main import app
+from app.services import get_db
+
+
+@pytest.fixture
+def request_sessions(db_engine, monkeypatch) -> list:
+    sessions = []
+
+    def get_request_db(request: Request):
+        sessions.append(request.state.db)
+        return request.state.db
+
+    # The suite overrides get_db with a plain session, these tests need the middleware's.
+    monkeypatch.setitem(app.dependency_overrides, get_db, get_request_db)
+    monkeypatch.setattr(
+        main,
+        "SessionLocal",
+        sessionmaker(bind=db_engine, class_=AsyncSession, expire_on_commit=False),
+    )
+    return sessions
+
+
+@pytest_asyncio.fixture
+async def checkouts(db_engine) -> list:
+    checkouts = []
+
+    def checkout(*args):
+        checkouts.append(args)
+
+    event.listen(db_engine.sync_engine, "checkout", checkout)
+    yield checkouts
+    event.remove(db_engine.sync_engine, "checkout", checkout)
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_do_not_check_out_connections(
+    async_client: AsyncClient, request_sessions, checkouts
+):
+    menu = await async_client.post(
+        "api/v1/menus", json={"title": "Menu", "description": "Menu"}
+    )
+    path = f"api/v1/menus/{menu.json()['id']}"
+    await async_client.get(path)
+    count = len(checkouts)
+    response = await async_client.get(path)
+    assert response.status_code == 200
+    assert len(checkouts) == count
+
+
+@pytest.mark.asyncio
+async def test_session_is_closed_when_the_response_starts(request_sessions, checkouts):
+    closed_at_start = []
+
+    async def checked_app(scope, receive, send):
+        async def checked_send(message):
+            if message["type"] == "http.response.start":
+                with pytest.raises(RuntimeError):
+                    request_sessions[-1].execute
+                closed_at_start.append(True)
+            await send(message)
+
+        await app(scope, receive, checked_send)
+
+    async with AsyncClient(app=checked_app, base_url="http://test") as client:
+        response = await client.post(
+            "api/v1/menus", json={"title": "Menu", "description": "Menu"}
+        )
+    assert response.status_code == 201
+    assert checkouts
+    assert closed_at_start == [True]
+    with pytest.raises(RuntimeError):
+        await request_sessions[-1].execute("SELECT 1")
@@ -0,0 +1,114 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_tree_get_empty(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/tree")
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_tree_post_menu(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus",
+        json={
+            "title": "My menu 1",
+            "description": "My menu description 1",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_tree_post_submenu(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus/1/submenus",
+        json={
+            "title": "My submenu 1",
+            "description": "My submenu description 1",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_tree_post_dish(async_client: AsyncClient):
+    response = await async_client.post(
+        "api/v1/menus/1/submenus/1/dishes",
+        json={
+            "title": "My dish 1",
+            "description": "My dish description 1",
+            "price": "12.50",
+        },
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_tree_get_menus_tree(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/tree")
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "id": "1",
+            "title": "My menu 1",
+            "description": "My menu description 1",
+            "submenus_count": 1,
+            "dishes_count": 1,
+            "submenus": [
+                {
+                    "id": "1",
+                    "title": "My submenu 1",
+                    "description": "My submenu description 1",
+                    "dishes_count": 1,
+                    "dishes": [
+                        {
+                            "id": "1",
+                            "title": "My dish 1",
+                            "description": "My dish description 1",
+                            "price": "12.50",
+                        }
+                    ],
+                }
+            ],
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_tree_patch_dish(async_client: AsyncClient):
+    response = await async_client.patch(
+        "api/v1/menus/1/submenus/1/dishes/1",
+        json={"price": "14.50"},
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_tree_get_menu_tree(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/1/tree")
+    assert response.status_code == 200
+    assert response.json()["submenus"][0]["dishes"][0]["price"] == "14.50"
+
+
+@pytest.mark.asyncio
+async def test_tree_delete_submenu(async_client: AsyncClient):
+    response = await async_client.delete("api/v1/menus/1/submenus/1")
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_tree_get_menus_tree_after_delete(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/tree")
+    assert response.status_code == 200
+    assert response.json()[0]["submenus"] == []
+    assert response.json()[0]["dishes_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_tree_get_menu_tree_not_found(async_client: AsyncClient):
+    response = await async_client.get("api/v1/menus/2/tree")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "menu not found"
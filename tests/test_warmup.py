@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import cache, warmup
+from app.services import Service, dishes_list_key, menus_list_key
+
+
+@pytest.mark.asyncio
+async def test_warm_up_fills_cache_and_reports_ready(
+    async_client: AsyncClient, db_engine, monkeypatch
+):
+    menu = await async_client.post(
+        "api/v1/menus", json={"title": "Menu", "description": "Menu"}
+    )
+    menu_id = menu.json()["id"]
+    submenu = await async_client.post(
+        f"api/v1/menus/{menu_id}/submenus",
+        json={"title": "Submenu", "description": "Submenu"},
+    )
+    submenu_id = submenu.json()["id"]
+    dishes = [
+        (
+            await async_client.post(
+                f"api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes",
+                json={"title": title, "description": title, "price": "1.00"},
+            )
+        ).json()
+        for title in ("Soup", "Salad", "Tea")
+    ]
+    monkeypatch.setattr(
+        warmup,
+        "SessionLocal",
+        sessionmaker(bind=db_engine, class_=AsyncSession, expire_on_commit=False),
+    )
+    monkeypatch.setattr(warmup, "ready", asyncio.Event())
+
+    response = await async_client.get("api/v1/health/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "starting"}
+
+    await warmup.warm_up()
+    warmup.ready.set()
+
+    menus_list, dishes_list = await Service.cache_names(
+        [menus_list_key(), dishes_list_key(int(menu_id), int(submenu_id))]
+    )
+    assert [menu["id"] for menu in await cache.get_cache(menus_list)] == [menu_id]
+    assert await cache.get_cache(dishes_list) == dishes
+    response = await async_client.get("api/v1/health/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}